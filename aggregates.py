@@ -0,0 +1,32 @@
+"""
+聚合查询：按字段分组计数，直接由本地镜像维护（镜像有写入时按需重建）。
+
+数值字段的筛选、求和、top-k 在 columns 中用向量化运算本地计算（见 tools.numeric_query），
+模型只拿到最终答案，不需要把整张结果表放进上下文里自己算。
+"""
+
+import threading
+from collections import Counter
+
+import mirror
+
+
+_group_counts = {}
+_group_counts_version = None
+_group_counts_lock = threading.Lock()
+
+
+def group_counts(table, field):
+    """
+    本地镜像中 table 表 field 字段每个取值的记录数，按数量降序
+    """
+    global _group_counts_version
+    source = mirror.get_mirror()
+    with _group_counts_lock:
+        if _group_counts_version != source.version:
+            _group_counts.clear()
+            _group_counts_version = source.version
+        if (table, field) not in _group_counts:
+            _group_counts[(table, field)] = Counter(
+                row.get(field, "") for row in source.rows[table].values()).most_common()
+        return _group_counts[(table, field)]
@@ -0,0 +1,95 @@
+"""
+公司别名索引：把公司简称、英文名称、曾用简称、曾用名以及括号/空白写法不同的名称映射到公司全称。
+
+索引在首次使用时从本地镜像构建，之后 law_api 返回的 CompanyInfo / CompanyRegister 记录会增量加入，
+augment_company_name 只有遇到未知名称时才会访问网络。
+"""
+
+import os
+import re
+import threading
+import unicodedata
+
+import mirror
+
+
+# 曾用简称/曾用名中多个名称之间的分隔符
+_SHORT_NAME_SEPARATORS = re.compile(r"[,，;；、/\s]+")
+_FULL_NAME_SEPARATORS = re.compile(r"[,，;；、/]+")
+_EMPTY_VALUES = {"", "-", "--", "无", "None", "null"}
+
+
+def normalize_name(name):
+    """
+    NFKC 统一全角/半角（含括号），去掉所有空白并转小写
+    """
+    name = unicodedata.normalize("NFKC", str(name))
+    return re.sub(r"\s+", "", name).lower()
+
+
+class AliasIndex:
+    def __init__(self):
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def add_alias(self, alias, company_names):
+        alias = normalize_name(alias)
+        if alias in _EMPTY_VALUES:
+            return
+        with self._lock:
+            names = self._aliases.setdefault(alias, [])
+            for name in company_names:
+                if name not in names:
+                    names.append(name)
+
+    def add_rows(self, table, rows):
+        for row in rows:
+            name = row.get("公司名称")
+            if not name:
+                continue
+            self.add_alias(name, [name])
+            if table == "CompanyInfo":
+                for alias in [row.get("公司简称", ""), row.get("英文名称", "")]:
+                    self.add_alias(alias, [name])
+                for alias in _SHORT_NAME_SEPARATORS.split(row.get("曾用简称", "")):
+                    self.add_alias(alias, [name])
+            elif table == "CompanyRegister":
+                for alias in _FULL_NAME_SEPARATORS.split(row.get("曾用名", "")):
+                    self.add_alias(alias.strip(), [name])
+
+    def refresh(self, source=None):
+        """
+        从本地镜像（增量地）加入全部公司记录
+        """
+        source = source or mirror.get_mirror()
+        for table in ["CompanyInfo", "CompanyRegister"]:
+            self.add_rows(table, list(source.rows[table].values()))
+
+    def resolve(self, name):
+        """
+        返回别名对应的公司全称列表，未知名称返回空列表
+        """
+        return list(self._aliases.get(normalize_name(name), []))
+
+    def __len__(self):
+        return len(self._aliases)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = AliasIndex()
+                if mirror.MODE != "off" or os.path.exists(mirror.PATH):
+                    index.refresh()
+                _index = index
+    return _index
+
+
+def resolve(name):
+    return get_index().resolve(name)
@@ -0,0 +1,81 @@
+"""
+get_sub_company_info 延迟对比：旧的串行实现 vs 并行+分批实现。
+
+law_api 用固定延迟的本地假实现代替，不访问网络：
+    python benchmarks/bench_sub_company.py --latency 0.1 --subs 300
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tools
+
+
+def make_fake_http_api_call(latency, n_subs):
+    parent = "华能国际电力股份有限公司"
+    subs = [f"华能测试子公司{i}有限公司" for i in range(n_subs)]
+
+    def fake_http_api_call(api_name, data, max_data_len=None):
+        time.sleep(latency)
+        if api_name == "search_company_name_by_info":
+            rows = [{"公司名称": parent}] if data["value"] == "华能国际" else []
+        elif api_name == "search_company_name_by_sub_info":
+            rows = [{"公司名称": s} for s in subs] if data["value"] == parent else []
+        elif api_name == "get_sub_company_info":
+            names = set(data["company_name"])
+            rows = [{"公司名称": s, "关联上市公司全称": parent} for s in subs if s in names]
+        else:
+            rows = []
+        return {"return_items_count": len(rows), "return": rows}
+
+    return fake_http_api_call
+
+
+def legacy_get_sub_company_info(company_name):
+    """
+    改造前的实现：逐个别名串行反查，逐个母公司串行查子公司，最后一次性查询全部明细
+    """
+    company_name = company_name if isinstance(company_name, list) else [company_name]
+    for c in company_name[:]:
+        company_name += tools.get_company_name_by_bref(c)
+        company_name += tools.get_company_name_by_en(c)
+        company_name += [c.replace("(", "（").replace(")", "）")]
+        company_name += [c.replace("（", "(").replace("）", ")")]
+    company_name = list(set(company_name))
+    all_subs = company_name[:]
+    for comp_name in company_name:
+        all_subs += [i["公司名称"] for i in tools.http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": comp_name})["return"]]
+    return tools.http_api_call("get_sub_company_info", {"company_name": all_subs})
+
+
+def timeit(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.1, help="每次 law_api 调用的模拟延迟（秒）")
+    parser.add_argument("--subs", type=int, default=300, help="子公司数量")
+    args = parser.parse_args()
+
+    tools.http_api_call = make_fake_http_api_call(args.latency, args.subs)
+    query = ["华能国际", "华能国际电力股份有限公司"]
+
+    legacy_time, legacy = timeit(legacy_get_sub_company_info, query[:])
+    new_time, new = timeit(tools.get_sub_company_info, query[:])
+    # 第二次调用复用母公司->子公司的解析结果
+    warm_time, _ = timeit(tools.get_sub_company_info, query[:])
+
+    print(f"legacy: {legacy_time:.3f}s, {legacy['return_items_count']} items")
+    print(f"new(cold): {new_time:.3f}s, {new['return_items_count']} items")
+    print(f"new(warm): {warm_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+基准测试用的合成数据：从问题文件中抽取公司名称、简称、案号和注册号，为每个实体生成确定性的假记录，
+供本地 law_api 替身和脚本化 GLM 替身共用，保证替身 GLM 发出的工具调用在替身 law_api 中都能查到数据。
+"""
+
+import random
+import re
+
+
+COMPANY_SUFFIXES = ("股份有限公司", "有限责任公司", "有限公司", "（有限合伙）")
+COMPANY_RE = re.compile(r"[一-龥（）()A-Za-z]{2,40}?(?:股份有限公司|有限责任公司|有限公司|（有限合伙）)")
+CASE_RE = re.compile(r"[(（]\d{4}[)）][一-龥\d]+?号")
+REGISTER_RE = re.compile(r"(?<!\d)\d{15}(?!\d)")
+SEGMENT_SEPARATORS = re.compile(r"[，,。？?、；;：:\s和与及]")
+PREFIXES = ("请问", "请帮我查询一下", "请帮我查询", "请查询一下", "请查询", "查询", "我想了解", "我想要查询", "我想知道",
+            "我想确认下", "想问问", "问下", "请指明", "请核查", "请提供", "请告知", "请告诉我", "能告诉我", "你能告诉我",
+            "帮我查一下", "在", "通过", "面临诉讼时", "能否", "一下")
+
+# 问题中出现的上市公司简称
+SHORT_NAMES = ["劲拓股份", "瑞丰光电", "天味食品", "正海磁材", "中海达", "耐普矿机", "亚光科技", "朗新科技", "海新能科",
+               "汉威科技", "景津装备"]
+INDUSTRIES = ["批发业", "酒、饮料和精制茶制造业", "开采辅助活动", "专用设备制造业", "医药制造业", "电力、热力生产和供应业"]
+CAUSES = ["合同纠纷", "技术服务合同纠纷", "不正当竞争纠纷", "买卖合同纠纷"]
+
+
+def strip_prefix(name):
+    changed = True
+    while changed:
+        changed = False
+        for prefix in PREFIXES:
+            if name.startswith(prefix) and len(name) > len(prefix) + 4:
+                name = name[len(prefix):]
+                changed = True
+    return name
+
+
+def extract_entities(text):
+    """
+    返回 {"companies": [...], "short_names": [...], "cases": [...], "registers": [...]}
+    """
+    companies = []
+    for segment in SEGMENT_SEPARATORS.split(text):
+        for match in COMPANY_RE.findall(segment):
+            companies.append(strip_prefix(match))
+    return {
+        "companies": list(dict.fromkeys(companies)),
+        "short_names": [name for name in SHORT_NAMES if name in text],
+        "cases": list(dict.fromkeys(CASE_RE.findall(text))),
+        "registers": list(dict.fromkeys(REGISTER_RE.findall(text))),
+    }
+
+
+def build_fixture(questions, seed=0, subs_per_company=6):
+    """
+    为问题中出现的实体生成四张表的假数据，返回 {表名: [记录]}
+    """
+    rnd = random.Random(seed)
+    companies, short_of, cases, registers = [], {}, [], []
+    for q in questions:
+        entities = extract_entities(q["question"])
+        companies += entities["companies"]
+        cases += entities["cases"]
+        registers += entities["registers"]
+        for short in entities["short_names"]:
+            full = short + "股份有限公司"
+            short_of[full] = short
+            companies.append(full)
+    companies = list(dict.fromkeys(companies))
+    # 为按行业聚合的问题准备额外的公司
+    companies += [f"{industry[:2]}测试{i}有限公司" for industry in INDUSTRIES for i in range(5)]
+
+    data = {"CompanyInfo": [], "CompanyRegister": [], "SubCompanyInfo": [], "LegalDocument": []}
+    register_numbers = list(dict.fromkeys(registers))
+    for i, name in enumerate(companies):
+        short = short_of.get(name, name[:4])
+        industry = INDUSTRIES[i % len(INDUSTRIES)]
+        data["CompanyInfo"].append({
+            "公司名称": name, "公司简称": short, "英文名称": f"Company {i} Co., Ltd.", "所属行业": industry,
+            "法人代表": f"法人{i}", "注册地址": f"某省某市某路{i}号", "办公地址": f"某省某市某路{i}号",
+            "联系电话": f"010-{rnd.randint(10000000, 99999999)}", "电子邮箱": f"ir{i}@example.com",
+            "邮政编码": f"{rnd.randint(100000, 999999)}", "董秘": f"董秘{i}", "曾用简称": "",
+            "经营范围": "技术开发、技术服务、销售。" * 20, "机构简介": "公司成立以来专注于主营业务。" * 20,
+        })
+        data["CompanyRegister"].append({
+            "公司名称": name, "登记状态": "存续", "统一社会信用代码": f"91{rnd.randint(10**15, 10**16 - 1)}",
+            "注册资本": f"{rnd.randint(100, 500000)}", "成立日期": f"20{rnd.randint(0, 20):02d}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}",
+            "注册号": register_numbers[i] if i < len(register_numbers) else f"{rnd.randint(10**14, 10**15 - 1)}",
+            "组织机构代码": f"{rnd.randint(10**7, 10**8 - 1)}-{rnd.randint(0, 9)}", "企业类型": "股份有限公司", "曾用名": "",
+        })
+        for j in range(subs_per_company if name.endswith("股份有限公司") else 0):
+            data["SubCompanyInfo"].append({
+                "关联上市公司全称": name, "关联上市公司股票简称": short, "上市公司关系": "子公司",
+                "上市公司参股比例": f"{rnd.choice([30, 51, 60, 100])}.00", "上市公司投资金额": f"{rnd.randint(100, 20000)}万",
+                "公司名称": f"{short}子公司{j}有限公司",
+            })
+    for i, case in enumerate(dict.fromkeys(cases + [f"(2020)京0101民初{i}号" for i in range(40)])):
+        plaintiff, defendant = rnd.sample(companies, 2)
+        data["LegalDocument"].append({
+            "案号": case, "标题": f"{plaintiff}与{defendant}{CAUSES[i % len(CAUSES)]}一审民事判决书",
+            "原告": plaintiff, "被告": defendant, "原告律师": "某律师事务所", "被告律师": "另一律师事务所",
+            "案由": CAUSES[i % len(CAUSES)], "涉案金额": f"{rnd.randint(1, 5000) * 1000}", "审理法条依据": "《中华人民共和国民法典》第五百七十七条",
+            "判决结果": "被告于本判决生效之日起十日内支付原告货款。" * 10, "胜诉方": plaintiff,
+        })
+    return data
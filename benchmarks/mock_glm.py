@@ -0,0 +1,92 @@
+"""
+脚本化的 GLM 替身，接口与 ZhipuAI 客户端的 chat.completions.create 相同。
+
+带 tools 的请求：第一轮根据问题中的案号、注册号、公司名称发出对应的 tool_calls（同一轮可能有多个），
+收到工具结果后给出最终回答；不带 tools 的请求直接回答（run_v2 的请求返回一段 python 代码）。
+token 用量按 compaction.estimate_tokens 估算。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhipuai.types.chat.chat_completion import Completion
+
+import compaction
+from benchmarks.fixtures import extract_entities
+
+
+class _Namespace:
+    pass
+
+
+class MockGLM:
+    def __init__(self, latency=0.0, per_token_latency=0.0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        # 与 ZhipuAI 客户端相同的调用路径 client.chat.completions.create
+        self.chat = _Namespace()
+        self.chat.completions = _Namespace()
+        self.chat.completions.create = self.create
+
+    def plan(self, query):
+        entities = extract_entities(query)
+        calls = []
+        if entities["cases"]:
+            calls.append(("get_legal_document", {"case_num": entities["cases"]}))
+        for number in entities["registers"]:
+            calls.append(("search_company_name_by_register", {"key": "注册号", "value": number}))
+        names = entities["companies"] + entities["short_names"]
+        if names:
+            if "子公司" in query:
+                calls.append(("get_sub_company_info", {"company_name": names}))
+            else:
+                calls.append(("get_company_info", {"company_name": names}))
+            if any(word in query for word in ["成立", "注册资本", "登记", "组织机构代码", "企业类型"]):
+                calls.append(("get_company_register", {"company_name": names}))
+        return calls
+
+    def create(self, model=None, messages=None, tools=None, temperature=None, top_p=None, **kwargs):
+        messages = messages or []
+        user_index = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=0)
+        query = messages[user_index].get("content", "") if messages else ""
+        observations = [m for m in messages[user_index:] if m.get("role") == "tool"]
+
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        calls = self.plan(query) if tools and not observations else []
+        if calls:
+            finish_reason = "tool_calls"
+            message["tool_calls"] = [
+                {"id": f"call_{uuid.uuid4().hex[:16]}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(args, ensure_ascii=False)}}
+                for name, args in calls
+            ]
+        elif "python" in (messages[0].get("content") or "") and tools is None and len(messages) == 2:
+            message["content"] = "```python\nprint(get_company_info(company_name=%s))\n```" % json.dumps(
+                extract_entities(query)["companies"][:1] or ["未知公司"], ensure_ascii=False)
+        else:
+            evidence = "".join((m.get("content") or "")[:200] for m in observations)
+            message["content"] = f"根据查询结果，{query}的答案如下：{evidence}"
+
+        prompt_tokens = compaction.messages_tokens(messages) + compaction.estimate_tokens(json.dumps(tools or [], ensure_ascii=False))
+        completion_tokens = compaction.message_tokens(message)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+        time.sleep(self.latency + self.per_token_latency * completion_tokens)
+
+        return Completion(**{
+            "id": uuid.uuid4().hex, "model": model, "created": int(time.time()),
+            "choices": [{"index": 0, "finish_reason": finish_reason, "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
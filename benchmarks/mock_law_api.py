@@ -0,0 +1,96 @@
+"""
+本地 law_api 替身：用 fixtures 生成的数据实现全部八个 /law_api/* 接口，可配置响应延迟和错误注入。
+
+    server = MockLawApi(data, latency=0.02, error_rate=0.05).start()
+    tools.domain = server.url
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mirror import Mirror
+
+
+class MockLawApi:
+    def __init__(self, data, latency=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        """
+        error_rate: 返回 500 的概率；throttle_rate: 返回 429（带 Retry-After）的概率
+        """
+        self.store = Mirror(None)
+        for table, rows in data.items():
+            self.store.add_rows(table, rows)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+        self._server = None
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def handle(self, api_name, data):
+        """
+        返回 (状态码, 响应体, 额外的响应头)
+        """
+        self._count("requests")
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            self._count("throttled")
+            return 429, {"msg": "too many requests"}, {"Retry-After": "0.1"}
+        if roll < self.throttle_rate + self.error_rate:
+            self._count("errors")
+            return 500, {"msg": "internal error"}, {}
+        rows = self.store.query(api_name, data)
+        if rows is None:
+            return 404, {"msg": f"unknown api {api_name}"}, {}
+        return 200, rows[0] if len(rows) == 1 else rows, {}
+
+    def start(self, host="127.0.0.1", port=0):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+                api_name = self.path.rsplit("/", 1)[-1]
+                status, payload, headers = mock.handle(api_name, json.loads(body or b"{}"))
+                content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,169 @@
+"""
+端到端基准测试：本地 law_api 替身 + 脚本化 GLM 替身，不访问任何外部服务。
+
+    python benchmarks/run_bench.py --limit 50 --api-latency 0.02 --glm-latency 0.3
+    python benchmarks/run_bench.py --save-baseline      # 把本次结果保存为基线
+
+统计吞吐（问题数/秒）、单个问题延迟的 p50/p95/p99、每个问题的 HTTP 调用数和 token 数，并与基线对比。
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache
+import glm_cache
+import mirror
+import run
+import run_v2
+import sandbox
+import tools
+import upstream
+from checkpoint import Checkpoint
+from utils import multi_thread_excute
+from benchmarks.fixtures import build_fixture
+from benchmarks.mock_glm import MockGLM
+from benchmarks.mock_law_api import MockLawApi
+
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+# 数值越小越好的指标；其余（吞吐）越大越好
+LOWER_IS_BETTER = {"p50", "p95", "p99", "http_calls_per_question", "tokens_per_question", "glm_calls_per_question",
+                   "fallback_rate"}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+
+def summarize(latencies, wall_time, http_calls, tokens, glm_calls):
+    n = len(latencies)
+    return {
+        "questions": n,
+        "wall_time": round(wall_time, 3),
+        "qps": round(n / wall_time, 3) if wall_time else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "http_calls_per_question": round(http_calls / n, 2) if n else 0.0,
+        "tokens_per_question": round(tokens / n, 1) if n else 0.0,
+        "glm_calls_per_question": round(glm_calls / n, 2) if n else 0.0,
+    }
+
+
+def bench_agent(questions_path, parallel, server, glm, workdir):
+    run.SUBMISSION_PATH = os.path.join(workdir, "sub.json")
+    run.TRACE_PATH = os.path.join(workdir, "trace.jsonl")
+    run.CHROME_TRACE_PATH = os.path.join(workdir, "trace.chrome.json")
+    checkpoint_path = os.path.join(workdir, "checkpoint.jsonl")
+    http_before, glm_before = server.stats["requests"], glm.stats["requests"]
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        run.run_all(parallel, resume=False, checkpoint_path=checkpoint_path, questions_path=questions_path)
+    wall_time = time.time() - start
+    records = list(Checkpoint(checkpoint_path).load().values())
+    return summarize([r["elapsed"] for r in records], wall_time, server.stats["requests"] - http_before,
+                     sum(r["tokens"] for r in records), glm.stats["requests"] - glm_before)
+
+
+def bench_v2(questions, parallel, server, glm):
+    http_before, glm_before = server.stats["requests"], glm.stats["requests"]
+
+    def task(line):
+        start = time.time()
+        answer, tokens_count, mode = run_v2.solve(line["question"])
+        return time.time() - start, tokens_count, mode
+
+    # 进程池预热不计入耗时
+    sandbox.get_pool().execute("pass")
+    start = time.time()
+    with redirect_stdout(io.StringIO()):
+        results = multi_thread_excute([[task, line] for line in questions], parallel)
+    wall_time = time.time() - start
+    report = summarize([r[0] for r in results], wall_time, server.stats["requests"] - http_before,
+                       sum(r[1] for r in results), glm.stats["requests"] - glm_before)
+    report["fallback_rate"] = round(sum(r[2] == "agent" for r in results) / len(results), 3) if results else 0.0
+    return report
+
+
+def compare(report, baseline):
+    for mode, metrics in report.items():
+        base = baseline.get(mode, {})
+        print(f"== {mode} ==")
+        for name, value in metrics.items():
+            if name not in base or not isinstance(value, (int, float)) or name in ("questions", "wall_time"):
+                print(f"  {name:<26}{value}")
+                continue
+            old = base[name]
+            delta = (value - old) / old * 100 if old else 0.0
+            better = (delta < 0) if name in LOWER_IS_BETTER else (delta > 0)
+            flag = "" if abs(delta) < 5 else ("  better" if better else "  WORSE")
+            print(f"  {name:<26}{value:<12}baseline {old:<12}{delta:+.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=os.path.join(ROOT, "question_junior_A.json"))
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--mode", choices=["agent", "v2", "both"], default="both")
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--glm-latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--api-rate", type=float, default=0, help="law_api 限速（请求/秒），0 表示不限速")
+    parser.add_argument("--glm-rate", type=float, default=0, help="GLM 限速（请求/秒），0 表示不限速")
+    parser.add_argument("--cache", action="store_true", help="启用 law_api 内存缓存（默认关闭以测量真实调用次数）")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    questions = run.load_questions(args.questions)[:args.limit]
+    workdir = tempfile.mkdtemp(prefix="law_bench_")
+    questions_path = os.path.join(workdir, "questions.json")
+    with open(questions_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(q, ensure_ascii=False) for q in questions))
+
+    server = MockLawApi(build_fixture(questions), latency=args.api_latency,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate).start()
+    glm = MockGLM(latency=args.glm_latency)
+    tools.domain = server.url
+    run.client = glm
+    run_v2.client = glm
+    upstream.get("law_api").bucket.rate = args.api_rate
+    upstream.get("glm").bucket.rate = args.glm_rate
+    cache.configure(enabled=args.cache, disk_path=None)
+    mirror.configure(mode="off")
+    glm_cache.configure(mode="passthrough")
+
+    report = {}
+    try:
+        if args.mode in ("agent", "both"):
+            report["agent"] = bench_agent(questions_path, args.parallel, server, glm, workdir)
+        if args.mode in ("v2", "both"):
+            report["v2"] = bench_v2(questions, args.parallel, server, glm)
+    finally:
+        server.stop()
+        sandbox.configure()
+
+    baseline = json.load(open(args.baseline, "r", encoding="utf-8")) if os.path.exists(args.baseline) else {}
+    compare(report, baseline)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print("baseline saved to", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
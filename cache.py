@@ -0,0 +1,211 @@
+"""
+law_api 响应的两级缓存：进程内 LRU + SQLite 磁盘缓存（跨进程、跨重启复用）。
+
+缓存键由 api_name 和规范化后的请求参数组成：字典按键排序、字符串列表排序去重，
+因此列表顺序不同的相同请求会命中同一条缓存。缓存键必须和实际发出的请求一致，括号写法不同的值不合并，
+get_* 请求在 tools.http_api_call 中同时发出两种括号写法。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+ENABLED = True
+MEMORY_MAX_ITEMS = 4096
+MEMORY_TTL = 3600  # 秒，None 表示不过期
+DISK_PATH = "./cache/law_api.sqlite"
+DISK_TTL = 7 * 24 * 3600  # 秒，None 表示不过期；DISK_PATH 为 None 时不使用磁盘缓存
+
+
+def canonicalize(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, set)):
+        items = [canonicalize(v) for v in value]
+        if all(isinstance(v, str) for v in items):
+            return sorted(set(items))
+        return items
+    if hasattr(value, "value"):  # Enum
+        return canonicalize(value.value)
+    return value
+
+
+def make_key(api_name, data):
+    payload = json.dumps(canonicalize(data), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return api_name + ":" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_items, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expire_at, value = item
+            if expire_at is not None and expire_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expire_at = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskCache:
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, api_name TEXT, value TEXT, created_at REAL)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl is not None and created_at + self.ttl < time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key, value):
+        api_name = key.split(":", 1)[0]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, api_name, value, created_at) VALUES (?, ?, ?, ?)",
+                (key, api_name, json.dumps(value, ensure_ascii=False), time.time()))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+
+class ResponseCache:
+    def __init__(self):
+        self.memory = LRUCache(MEMORY_MAX_ITEMS, MEMORY_TTL)
+        self.disk = DiskCache(DISK_PATH, DISK_TTL) if DISK_PATH else None
+        self._stats_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypass": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["memory_items"] = len(self.memory)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure(enabled=None, memory_max_items=None, memory_ttl=-1, disk_path=-1, disk_ttl=-1):
+    """
+    修改缓存配置并重建缓存实例；ttl/disk_path 传 None 表示不过期/不使用磁盘，-1 表示保持不变
+    """
+    global ENABLED, MEMORY_MAX_ITEMS, MEMORY_TTL, DISK_PATH, DISK_TTL, _cache
+    with _cache_lock:
+        if enabled is not None:
+            ENABLED = enabled
+        if memory_max_items is not None:
+            MEMORY_MAX_ITEMS = memory_max_items
+        if memory_ttl != -1:
+            MEMORY_TTL = memory_ttl
+        if disk_path != -1:
+            DISK_PATH = disk_path
+        if disk_ttl != -1:
+            DISK_TTL = disk_ttl
+        _cache = None
+
+
+def cached_call(api_name, data, func, use_cache=True):
+    """
+    带缓存地执行 func()，func 返回可 JSON 序列化的响应
+    """
+    if not (ENABLED and use_cache):
+        if ENABLED:
+            get_cache()._count("bypass")
+        return func()
+    cache = get_cache()
+    key = make_key(api_name, data)
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value)
+    return value
+
+
+def stats():
+    return get_cache().get_stats()
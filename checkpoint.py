@@ -0,0 +1,68 @@
+"""
+run_all 的增量检查点：每个问题完成后立即追加一行到 JSONL 文件（答案、token 数、耗时），
+重启时跳过已经回答过的 id，最后由 merge 按 id 排序生成提交文件。
+"""
+
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._tail_checked = False
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def load(self):
+        """
+        返回 id -> 记录；同一个 id 有多条时以最后一条为准，写到一半的行会被忽略
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["id"]] = record
+        return records
+
+    def answered_ids(self):
+        return set(self.load())
+
+    def _needs_newline(self):
+        """
+        上次运行崩溃时最后一行可能只写了一半，需要先换行，否则新记录会接在这一行后面一起被 load 忽略
+        """
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if not self._tail_checked:
+                line = ("\n" if self._needs_newline() else "") + line
+                self._tail_checked = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def merge(self, output_path, fields=("id", "question", "answer")):
+        """
+        按 id 排序写出提交文件，返回记录列表
+        """
+        records = sorted(self.load().values(), key=lambda x: x["id"])
+        if os.path.dirname(output_path):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join([json.dumps({k: r[k] for k in fields}, ensure_ascii=False) for r in records]))
+        return records
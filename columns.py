@@ -0,0 +1,169 @@
+"""
+数值字段的列式存储：把注册资本、参股比例、投资金额、涉案金额等带单位的字符串解析成 float64 列（NumPy），
+筛选、求和、top-k 都是向量化运算，模型不需要在上下文里逐条解析和比较字符串。
+
+    cols = Columns(rows)
+    mask = cols.mask([("上市公司参股比例", ">", 50), ("上市公司投资金额", ">", 5e7)])
+    cols.count(mask), cols.sum("上市公司投资金额", mask), cols.top_k("上市公司投资金额", 3, mask)
+
+本地镜像中的整张表按镜像版本缓存为 Columns，见 from_mirror。
+"""
+
+import operator
+import re
+import threading
+
+import numpy as np
+
+import mirror
+
+
+# 数值字段没有写单位时的默认倍数，金额统一换算为元；比例保持百分数数值（51% -> 51.0）
+NUMERIC_FIELDS = {
+    "注册资本": 1e4,  # 单位：万元
+    "参保人数": 1,
+    "每股面值": 1,
+    "首发价格": 1,
+    "首发募资净额": 1,
+    "上市公司参股比例": 1,
+    "上市公司投资金额": 1,
+    "涉案金额": 1,
+}
+
+_UNITS = {"亿": 1e8, "万": 1e4, "千": 1e3}
+_NUMBER = re.compile(r"(-?\d+(?:\.\d+)?)\s*(亿|万|千)?")
+
+
+def parse_number(text, default_unit=1):
+    """
+    解析带单位的数值字符串，如 "1.5亿" -> 150000000.0，"51.00%" -> 51.0；无法解析时返回 None
+    """
+    match = _NUMBER.search(str(text).replace(",", "").replace("，", ""))
+    if match is None:
+        return None
+    number = float(match.group(1))
+    unit = match.group(2)
+    return number * (_UNITS[unit] if unit else default_unit)
+
+
+def parse_field(field, text):
+    return parse_number(text, NUMERIC_FIELDS.get(field, 1))
+
+
+OPERATORS = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "=": operator.eq, "==": operator.eq,
+}
+_CONDITION = re.compile(r"^\s*(.+?)\s*(>=|<=|==|>|<|=)\s*(.+?)\s*$")
+
+
+def parse_condition(text):
+    """
+    "上市公司参股比例>50%" -> ("上市公司参股比例", ">", 50.0)；值不写单位时按该字段的默认单位换算
+    """
+    match = _CONDITION.match(str(text))
+    if match is None:
+        raise ValueError(f"无法解析条件 `{text}`，格式应为 字段>数值，例如 上市公司投资金额>5000万")
+    field, op, value = match.groups()
+    number = parse_field(field, value)
+    if number is None:
+        raise ValueError(f"条件 `{text}` 中的值不是数值")
+    return field, op, number
+
+
+class Columns:
+    """
+    一组记录的列式视图：数值列在第一次使用时解析为 float64 数组，无法解析的值为 NaN（任何比较都不满足）
+    """
+    def __init__(self, rows, key_field="公司名称"):
+        self.rows = list(rows)
+        self.key_field = key_field
+        self._numeric = {}
+        self._text = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def numeric(self, field):
+        with self._lock:
+            if field not in self._numeric:
+                values = (parse_field(field, row.get(field, "")) for row in self.rows)
+                self._numeric[field] = np.fromiter(
+                    (np.nan if v is None else v for v in values), dtype=np.float64, count=len(self.rows))
+            return self._numeric[field]
+
+    def text(self, field):
+        with self._lock:
+            if field not in self._text:
+                self._text[field] = np.array([mirror.normalize_value(row.get(field, "")) for row in self.rows],
+                                             dtype=object)
+            return self._text[field]
+
+    def mask(self, conditions=(), text_in=None):
+        """
+        conditions: [(字段, 运算符, 数值)]，全部满足；text_in: {字段: 取值集合}，字段取值（规范化后）在集合中
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        for field, op, value in conditions:
+            with np.errstate(invalid="ignore"):
+                mask &= OPERATORS[op](self.numeric(field), value)
+        for field, values in (text_in or {}).items():
+            mask &= np.isin(self.text(field), [mirror.normalize_value(v) for v in values])
+        return mask
+
+    def unique(self, mask, field=None):
+        """
+        在 mask 中按 field（默认主键）去重，只保留每个取值第一次出现的记录
+        """
+        keys = self.text(field or self.key_field)
+        _, first = np.unique(keys[mask], return_index=True)
+        unique = np.zeros(len(self.rows), dtype=bool)
+        unique[np.flatnonzero(mask)[first]] = True
+        return unique
+
+    def count(self, mask=None):
+        return int(mask.sum()) if mask is not None else len(self.rows)
+
+    def sum(self, field, mask=None):
+        values = self.numeric(field)
+        return float(np.nansum(values if mask is None else values[mask]))
+
+    def top_k(self, field, k, mask=None, ascending=False):
+        """
+        返回 [(数值, 记录)]，按 field 排序的前 k 条，NaN 不参与排序
+        """
+        values = self.numeric(field)
+        valid = ~np.isnan(values) if mask is None else mask & ~np.isnan(values)
+        index = np.flatnonzero(valid)
+        if not len(index) or k <= 0:
+            return []
+        keys = values[index] if ascending else -values[index]
+        if len(index) > k:
+            # 保持原始顺序，使并列的记录按出现先后排列
+            part = np.sort(np.argpartition(keys, k - 1)[:k])
+            index, keys = index[part], keys[part]
+        order = index[np.argsort(keys, kind="stable")]
+        return [(float(values[i]), self.rows[i]) for i in order]
+
+    def select(self, mask):
+        return [self.rows[i] for i in np.flatnonzero(mask)]
+
+
+_mirror_columns = {}
+_mirror_version = None
+_mirror_lock = threading.Lock()
+
+
+def from_mirror(table, key_field="公司名称"):
+    """
+    本地镜像中整张表的 Columns，镜像有写入时重建
+    """
+    global _mirror_version
+    source = mirror.get_mirror()
+    with _mirror_lock:
+        if _mirror_version != source.version:
+            _mirror_columns.clear()
+            _mirror_version = source.version
+        if table not in _mirror_columns:
+            _mirror_columns[table] = Columns(source.rows[table].values(), key_field)
+        return _mirror_columns[table]
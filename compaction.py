@@ -0,0 +1,111 @@
+"""
+发送给 GLM 之前压缩对话上下文。
+
+agent 每一轮都会重发全部历史，其中大部分是早期工具调用的原始返回。压缩只作用于本轮请求，完整历史保持不变：
+1. 同一个工具以相同参数被再次调用时，较早的返回结果被替换为一句说明；
+2. 超过 TOKEN_BUDGET 时，之前轮次的工具返回除最近 KEEP_RECENT_OBSERVATIONS 条外截断到 STALE_OBSERVATION_CHARS 个字符；
+3. 仍超过预算时，从最早的工具返回开始继续截半，直到满足预算或无法再压缩。
+最后一条 assistant 消息之后的工具返回（刚执行完、模型还没看过的这一批）不截断。
+system / user / assistant 消息以及 tool_call_id 的对应关系始终保留。
+"""
+
+import json
+import re
+
+
+TOKEN_BUDGET = 12000
+KEEP_RECENT_OBSERVATIONS = 2
+STALE_OBSERVATION_CHARS = 300
+MIN_OBSERVATION_CHARS = 80
+
+_CJK = re.compile(r"[　-〿一-鿿＀-￯]")
+
+
+def estimate_tokens(text):
+    """
+    粗略估计 token 数：中文字符约 1 个 token，其余字符约 4 个一个 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def message_tokens(message):
+    tokens = 4 + estimate_tokens(message.get("content") or "")
+    for call in message.get("tool_calls") or []:
+        function = call.get("function") or {}
+        tokens += estimate_tokens(function.get("name", "")) + estimate_tokens(function.get("arguments", ""))
+    return tokens
+
+
+def messages_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def _truncate(content, limit):
+    if len(content) <= limit:
+        return content
+    return content[:limit] + f"...(已省略{len(content) - limit}字)"
+
+
+def _call_key(call):
+    function = call.get("function") or {}
+    try:
+        args = json.dumps(json.loads(function.get("arguments") or "{}"), ensure_ascii=False, sort_keys=True)
+    except (TypeError, json.JSONDecodeError):
+        args = function.get("arguments")
+    return function.get("name"), args
+
+
+def compact(messages, budget=None):
+    """
+    返回 (压缩后的消息列表, 压缩前估计token数, 压缩后估计token数)
+    """
+    budget = TOKEN_BUDGET if budget is None else budget
+    before = messages_tokens(messages)
+    messages = [dict(m) for m in messages]
+
+    calls = {}
+    for m in messages:
+        for call in m.get("tool_calls") or []:
+            calls[call.get("id")] = _call_key(call)
+    observations = [i for i, m in enumerate(messages) if m.get("role") == "tool"]
+    last_assistant = max((i for i, m in enumerate(messages) if m.get("role") == "assistant"), default=-1)
+    # 之前轮次的工具返回，只有这些可以截断
+    earlier = [i for i in observations if i < last_assistant]
+
+    # 1. 被后续相同调用取代的结果
+    seen = set()
+    for i in reversed(observations):
+        key = calls.get(messages[i].get("tool_call_id"))
+        if key is None:
+            continue
+        if key in seen:
+            messages[i]["content"] = "(该结果已被后面相同调用的结果取代)"
+        seen.add(key)
+
+    # 2. 超过预算时较早的工具返回截断
+    total = messages_tokens(messages)
+    if total > budget:
+        stale = earlier[:-KEEP_RECENT_OBSERVATIONS] if KEEP_RECENT_OBSERVATIONS else earlier
+        for i in stale:
+            messages[i]["content"] = _truncate(messages[i]["content"] or "", STALE_OBSERVATION_CHARS)
+        total = messages_tokens(messages)
+
+    # 3. 按预算继续从最早的工具返回开始截半
+    while total > budget:
+        shrunk = False
+        for i in earlier:
+            content = messages[i]["content"] or ""
+            limit = max(len(content) // 2, MIN_OBSERVATION_CHARS)
+            if len(content) > limit + 20:
+                messages[i]["content"] = _truncate(content, limit)
+                shrunk = True
+                total = messages_tokens(messages)
+                if total <= budget:
+                    break
+        if not shrunk:
+            break
+
+    return messages, before, total
@@ -0,0 +1,125 @@
+"""
+全局并发控制与异步适配。
+
+law_api 与 GLM 请求各有一个进程级的并发上限（见 upstream.py）限制同时在途的请求数，同步调用和异步调用共用同一套限制。
+异步接口把阻塞调用放到按上游划分的固定大小线程池中执行，因此同时挂起数百个问题的协程也只占用有限的线程。
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import upstream
+
+
+# 并发上限由 upstream 中按错误率自适应的限流器控制，这里的线程池按其最大值配置
+LAW_API_CONCURRENCY = upstream.get("law_api").limiter.max_limit
+GLM_CONCURRENCY = upstream.get("glm").limiter.max_limit
+FAN_OUT_WORKERS = 32
+
+_executors = {
+    "law_api": ThreadPoolExecutor(max_workers=LAW_API_CONCURRENCY, thread_name_prefix="law_api"),
+    "glm": ThreadPoolExecutor(max_workers=GLM_CONCURRENCY, thread_name_prefix="glm"),
+    # 工具内部的并行子请求，与执行工具本身的线程池分开，避免嵌套提交导致死锁
+    "fan_out": ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="fan_out"),
+}
+
+
+@contextmanager
+def limit(name):
+    """
+    占用一个上游的并发名额，名额用尽时阻塞等待
+    """
+    with upstream.get(name).limiter.slot():
+        yield
+
+
+async def to_thread(name, func, *args, **kwargs):
+    """
+    在 name 对应的线程池中执行阻塞函数，并保留当前协程的 contextvars
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executors[name], functools.partial(ctx.run, func, *args, **kwargs))
+
+
+def asyncify(func, name="law_api"):
+    """
+    把同步函数包装成同名的协程函数
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await to_thread(name, func, *args, **kwargs)
+    return wrapper
+
+
+def thread_map(func, items):
+    """
+    并行执行 func(item)，按输入顺序返回结果；只有一个元素时直接在当前线程执行
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    futures = [_executors["fan_out"].submit(contextvars.copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一个 key 同时只执行一次 func，其余调用者等待并共享其结果（或异常）
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"calls": 0, "executed": 0, "shared": 0}
+        _single_flights[name] = self
+
+    def do(self, key, func):
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executed"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_single_flights = {}
+
+
+def single_flight_stats():
+    """
+    各合并层的统计，shared 即节省的上游调用次数
+    """
+    return {name: dict(flight.stats) for name, flight in _single_flights.items()}
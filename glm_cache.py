@@ -0,0 +1,92 @@
+"""
+call_glm 的录制/回放缓存。
+
+以 model、messages、tools、temperature、top_p 的规范化 JSON 的 sha256 作为键，响应保存在本地磁盘，每个键一个文件。
+MODE:
+    passthrough 直接调用 GLM，不读写缓存（默认）
+    record      命中缓存时直接返回，未命中时调用 GLM 并保存响应
+    replay      只从缓存返回，未命中时抛出 GLMCacheMiss，可完全离线运行
+DETERMINISTIC 为 True 时固定 temperature/top_p，使相同输入的请求在多次运行间得到相同的键和尽量稳定的输出，用于基准测试。
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from zhipuai.types.chat.chat_completion import Completion
+
+
+MODE = os.environ.get("GLM_CACHE_MODE", "passthrough")
+DIR = os.environ.get("GLM_CACHE_DIR", "./cache/glm")
+DETERMINISTIC = os.environ.get("GLM_DETERMINISTIC", "") == "1"
+DETERMINISTIC_TEMPERATURE = 0.01
+DETERMINISTIC_TOP_P = 0.01
+
+_stats = {"hits": 0, "misses": 0, "recorded": 0}
+_stats_lock = threading.Lock()
+
+
+class GLMCacheMiss(KeyError):
+    pass
+
+
+def configure(mode=None, dir=None, deterministic=None):
+    global MODE, DIR, DETERMINISTIC
+    if mode is not None:
+        MODE = mode
+    if dir is not None:
+        DIR = dir
+    if deterministic is not None:
+        DETERMINISTIC = deterministic
+
+
+def make_key(model, messages, tools, temperature, top_p):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "tools": tools, "temperature": temperature, "top_p": top_p},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(DIR, key[:2], key + ".json")
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def completion(create, model, messages, tools=None, temperature=0.95, top_p=0.9):
+    """
+    create(model=..., messages=..., tools=..., temperature=..., top_p=...) 执行真正的 GLM 调用
+    """
+    if DETERMINISTIC:
+        temperature, top_p = DETERMINISTIC_TEMPERATURE, DETERMINISTIC_TOP_P
+    kwargs = dict(model=model, messages=messages, tools=tools, temperature=temperature, top_p=top_p)
+    if MODE == "passthrough":
+        return create(**kwargs)
+
+    key = make_key(**kwargs)
+    path = _path(key)
+    if os.path.exists(path):
+        _count("hits")
+        with open(path, "r", encoding="utf-8") as f:
+            return Completion(**json.load(f))
+    _count("misses")
+    if MODE == "replay":
+        raise GLMCacheMiss(key)
+
+    response = create(**kwargs)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(response.model_dump(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    _count("recorded")
+    return response
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,82 @@
+"""
+共享的 HTTP 连接池。所有 law_api 调用都通过这里的 Session 发出，复用 keep-alive 连接，
+避免每次工具调用都重新进行 TCP+TLS 握手。
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 每个 host 保留的连接池数量 / 每个连接池的最大连接数（应不小于并发线程数）
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+# 默认超时（秒）：(连接超时, 读取超时)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure(pool_connections=None, pool_maxsize=None, connect_timeout=None, read_timeout=None):
+    """
+    修改连接池配置，会丢弃已有的 Session，下次请求时按新配置重建
+    """
+    global POOL_CONNECTIONS, POOL_MAXSIZE, CONNECT_TIMEOUT, READ_TIMEOUT, _session
+    with _session_lock:
+        if pool_connections is not None:
+            POOL_CONNECTIONS = pool_connections
+        if pool_maxsize is not None:
+            POOL_MAXSIZE = pool_maxsize
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # pool_block=True: 连接池满时等待空闲连接，而不是新建后丢弃
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def post(url, json=None, headers=None, connect_timeout=None, read_timeout=None):
+    timeout = (
+        CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+        READ_TIMEOUT if read_timeout is None else read_timeout,
+    )
+    return get_session().post(url, json=json, headers=headers, timeout=timeout)
+
+
+def pool_stats():
+    """
+    返回每个 host 的连接池统计：requests 为发出的请求数，misses 为新建连接数，hits 为复用连接的请求数
+    """
+    stats = {}
+    session = _session
+    if session is None:
+        return stats
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            item = stats.setdefault(host, {"requests": 0, "hits": 0, "misses": 0})
+            item["requests"] += pool.num_requests
+            item["misses"] += pool.num_connections
+            item["hits"] += max(pool.num_requests - pool.num_connections, 0)
+    return stats
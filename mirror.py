@@ -0,0 +1,298 @@
+"""
+四张数据表的本地镜像。
+
+镜像持久化在 SQLite 中，加载后在内存里为每个字段建立二级索引，get_* / search_* 接口可以直接在本地应答，
+返回结构与 law_api 相同。通过 MODE 控制是否使用：
+    off    不使用镜像（默认）
+    prefer 镜像能给出完整结果时在本地应答，否则访问网络：get_* 要求请求的每个值都在镜像中，
+           search_* 要求该表被标记为完整同步
+    only   只查镜像，完全离线运行
+
+构建镜像：
+    python mirror.py sync --from-cache               # 从 law_api 响应缓存中收集记录
+    python mirror.py sync --import data.jsonl        # 每行 {"table": "CompanyInfo", ...字段}
+    python mirror.py sync --names names.txt          # 按公司名称逐个从 law_api 拉取
+    python mirror.py sync --import data.jsonl --complete CompanyInfo   # 导入的是整张表时标记为完整同步
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+from schema import CompanyInfo, CompanyRegister, SubCompanyInfo, LegalDocument
+
+
+MODE = os.environ.get("LAW_MIRROR_MODE", "off")
+PATH = os.environ.get("LAW_MIRROR_PATH", "./cache/mirror.sqlite")
+
+TABLES = {
+    "CompanyInfo": CompanyInfo,
+    "CompanyRegister": CompanyRegister,
+    "SubCompanyInfo": SubCompanyInfo,
+    "LegalDocument": LegalDocument,
+}
+
+# 每张表中用于确定一条记录的字段
+PRIMARY_KEYS = {
+    "CompanyInfo": ["公司名称"],
+    "CompanyRegister": ["公司名称"],
+    "SubCompanyInfo": ["公司名称", "关联上市公司全称"],
+    "LegalDocument": ["案号"],
+}
+
+# get_* 接口：api_name -> (表名, 参数名, 匹配字段)
+GET_APIS = {
+    "get_company_info": ("CompanyInfo", "company_name", "公司名称"),
+    "get_company_register": ("CompanyRegister", "company_name", "公司名称"),
+    "get_sub_company_info": ("SubCompanyInfo", "company_name", "公司名称"),
+    "get_legal_document": ("LegalDocument", "case_num", "案号"),
+}
+
+# search_* 接口：api_name -> (表名, 返回字段)
+SEARCH_APIS = {
+    "search_company_name_by_info": ("CompanyInfo", "公司名称"),
+    "search_company_name_by_register": ("CompanyRegister", "公司名称"),
+    "search_company_name_by_sub_info": ("SubCompanyInfo", "公司名称"),
+    "search_case_num_by_legal_document": ("LegalDocument", "案号"),
+}
+
+
+def normalize_value(value):
+    value = value.value if hasattr(value, "value") else value
+    return str(value).strip().replace("（", "(").replace("）", ")")
+
+
+class Mirror:
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = {table: {} for table in TABLES}
+        # 表名 -> 字段 -> 规范化后的值 -> 主键集合
+        self.index = {table: defaultdict(lambda: defaultdict(set)) for table in TABLES}
+        # 每次写入递增，供依赖镜像数据的派生结构判断是否需要重建
+        self.version = 0
+        # 标记为完整同步的表，只有这些表可以在本地回答 search_* 和全表统计
+        self.complete = set()
+        self._lock = threading.RLock()
+        self._conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (table_name TEXT, pk TEXT, data TEXT, PRIMARY KEY (table_name, pk))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS complete_tables (table_name TEXT PRIMARY KEY)")
+            self._conn.commit()
+            self._load()
+
+    def _load(self):
+        for table, pk, data in self._conn.execute("SELECT table_name, pk, data FROM rows"):
+            if table in TABLES:
+                self._index_row(table, pk, json.loads(data))
+        self.complete = {table for table, in self._conn.execute("SELECT table_name FROM complete_tables")}
+        self.version += 1
+
+    def _primary_key(self, table, row):
+        return "|".join(normalize_value(row.get(field, "")) for field in PRIMARY_KEYS[table])
+
+    def _index_row(self, table, pk, row):
+        old = self.rows[table].get(pk)
+        if old is not None:
+            for field, value in old.items():
+                self.index[table][field][normalize_value(value)].discard(pk)
+        self.rows[table][pk] = row
+        for field, value in row.items():
+            self.index[table][field][normalize_value(value)].add(pk)
+
+    def add_rows(self, table, rows):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table `{table}`")
+        fields = TABLES[table].__fields__.keys()
+        rows = [{field: str(row.get(field, "")) for field in fields} for row in rows if isinstance(row, dict)]
+        rows = [row for row in rows if all(row[field] for field in PRIMARY_KEYS[table])]
+        with self._lock:
+            records = []
+            for row in rows:
+                pk = self._primary_key(table, row)
+                self._index_row(table, pk, row)
+                records.append((table, pk, json.dumps(row, ensure_ascii=False)))
+            if self._conn is not None and records:
+                self._conn.executemany("INSERT OR REPLACE INTO rows (table_name, pk, data) VALUES (?, ?, ?)", records)
+                self._conn.commit()
+            self.version += 1
+        return len(rows)
+
+    def mark_complete(self, table, complete=True):
+        """
+        标记 table 已完整同步（镜像中就是 law_api 的全部记录）
+        """
+        if table not in TABLES:
+            raise ValueError(f"Unknown table `{table}`")
+        with self._lock:
+            if complete:
+                self.complete.add(table)
+            else:
+                self.complete.discard(table)
+            if self._conn is not None:
+                sql = ("INSERT OR REPLACE INTO complete_tables (table_name) VALUES (?)" if complete
+                       else "DELETE FROM complete_tables WHERE table_name = ?")
+                self._conn.execute(sql, (table,))
+                self._conn.commit()
+            self.version += 1
+
+    def is_complete(self, table):
+        return table in self.complete
+
+    def covers(self, api_name, data):
+        """
+        镜像能否给出与 law_api 相同的结果：get_* 的每个请求值都有记录（或整表完整），search_* 需要整表完整
+        """
+        if api_name in GET_APIS:
+            table, param, field = GET_APIS[api_name]
+            if self.is_complete(table):
+                return True
+            values = data.get(param, [])
+            values = values if isinstance(values, list) else [values]
+            return bool(values) and all(self.find(table, field, value) for value in values)
+        if api_name in SEARCH_APIS:
+            return self.is_complete(SEARCH_APIS[api_name][0])
+        return False
+
+    def find(self, table, field, value):
+        """
+        返回 field 等于 value 的所有记录
+        """
+        pks = self.index[table].get(field, {}).get(normalize_value(value), ())
+        return [self.rows[table][pk] for pk in sorted(pks)]
+
+    def count(self, table):
+        return len(self.rows[table])
+
+    def query(self, api_name, data):
+        """
+        按 law_api 的语义在本地应答，返回记录列表；不支持的接口返回 None
+        """
+        if api_name in GET_APIS:
+            table, param, field = GET_APIS[api_name]
+            values = data.get(param, [])
+            values = values if isinstance(values, list) else [values]
+            result, seen = [], set()
+            for value in values:
+                for row in self.find(table, field, value):
+                    pk = self._primary_key(table, row)
+                    if pk not in seen:
+                        seen.add(pk)
+                        result.append(row)
+            return result
+        if api_name in SEARCH_APIS:
+            table, return_field = SEARCH_APIS[api_name]
+            key = data.get("key")
+            key = key.value if hasattr(key, "value") else key
+            names = dict.fromkeys(row[return_field] for row in self.find(table, key, data.get("value")))
+            return [{return_field: name} for name in names]
+        return None
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror():
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = Mirror(PATH)
+    return _mirror
+
+
+def configure(mode=None, path=None):
+    global MODE, PATH, _mirror
+    with _mirror_lock:
+        if mode is not None:
+            MODE = mode
+        if path is not None:
+            PATH = path
+            _mirror = None
+
+
+def lookup(api_name, data):
+    """
+    http_api_call 的本地入口：返回 None 表示需要访问网络
+    """
+    if MODE == "off":
+        return None
+    source = get_mirror()
+    if MODE == "only":
+        result = source.query(api_name, data)
+        return [] if result is None else result
+    # prefer：部分同步的镜像只会给出不完整的结果，这时整个请求访问网络
+    return source.query(api_name, data) if source.covers(api_name, data) else None
+
+
+def sync_from_cache(mirror, cache_path):
+    conn = sqlite3.connect(cache_path)
+    total = 0
+    for api_name, value in conn.execute("SELECT api_name, value FROM cache"):
+        if api_name in GET_APIS:
+            total += mirror.add_rows(GET_APIS[api_name][0], json.loads(value))
+    return total
+
+
+def sync_from_file(mirror, path):
+    by_table = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    by_table[row.pop("table")].append(row)
+        else:
+            for table, rows in json.load(f).items():
+                by_table[table] += rows
+    return sum(mirror.add_rows(table, rows) for table, rows in by_table.items())
+
+
+def sync_from_api(mirror, names):
+    import tools
+
+    total = 0
+    for api_name in ["get_company_info", "get_company_register"]:
+        table = GET_APIS[api_name][0]
+        for i in range(0, len(names), 50):
+            total += mirror.add_rows(table, tools.fetch_api(api_name, {"company_name": names[i:i + 50]}))
+    for name in names:
+        subs = tools.fetch_api("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": name})
+        subs = [i["公司名称"] for i in subs if "公司名称" in i]
+        if subs:
+            total += mirror.add_rows("SubCompanyInfo", tools.fetch_api("get_sub_company_info", {"company_name": subs}))
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["sync", "stats"])
+    parser.add_argument("--path", default=PATH)
+    parser.add_argument("--from-cache", nargs="?", const="./cache/law_api.sqlite", default=None)
+    parser.add_argument("--import", dest="import_path", default=None)
+    parser.add_argument("--names", default=None, help="每行一个公司名称")
+    parser.add_argument("--complete", nargs="*", default=None, choices=list(TABLES),
+                        help="把这些表（不写表名时为全部表）标记为完整同步")
+    args = parser.parse_args()
+
+    mirror = Mirror(args.path)
+    if args.command == "sync":
+        if args.from_cache:
+            print("from cache:", sync_from_cache(mirror, args.from_cache))
+        if args.import_path:
+            print("from file:", sync_from_file(mirror, args.import_path))
+        if args.names:
+            names = [i.strip() for i in open(args.names, "r", encoding="utf-8") if i.strip()]
+            print("from api:", sync_from_api(mirror, names))
+        if args.complete is not None:
+            for table in args.complete or TABLES:
+                mirror.mark_complete(table)
+    for table in TABLES:
+        print(table, mirror.count(table), "complete" if mirror.is_complete(table) else "partial")
@@ -0,0 +1,158 @@
+"""
+run_all 开始之前的跨问题批量预取：扫描全部问题中的公司全称、简称、案号和注册号，
+用 get_company_info / get_company_register / get_sub_company_info / get_legal_document 的列表参数成批拉取，
+按实体保存在内存里，agent 之后的工具调用大多在本地命中。
+
+    prefetch.warm(questions)           # run_all / arun_all 会自动调用，LAW_PREFETCH=0 关闭
+    prefetch.lookup(api_name, data)    # http_api_call 的本地入口，返回 None 表示需要访问网络
+
+和镜像不同，这里只保存预取过的实体：请求中的每个值都预取过（包括查不到数据的值）时才在本地应答，
+否则整个请求照常访问网络，所以不会返回不完整的结果。
+"""
+
+import os
+import re
+import threading
+import time
+
+import concurrency
+import mirror
+import tracing
+
+
+ENABLED = os.environ.get("LAW_PREFETCH", "1") != "0"
+CHUNK_SIZE = 50
+# 没有公司全称时，句首的主语通常是简称（“劲拓股份拥有哪些子公司”）；取错只多一次简称查询
+SUBJECT_RE = re.compile(r"^([一-龥A-Za-z]{2,10}?)(?:的|这家|公司|拥有|旗下|在|有|控股|持有|投资|全资|对|中|，)")
+
+# api_name -> 规范化的请求值 -> 记录列表（查不到数据时为空列表）
+_store = {api_name: {} for api_name in mirror.GET_APIS}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def lookup(api_name, data):
+    if not ENABLED or api_name not in _store:
+        return None
+    _, param, _ = mirror.GET_APIS[api_name]
+    values = data.get(param, [])
+    values = values if isinstance(values, list) else [values]
+    keys = [mirror.normalize_value(v) for v in values]
+    with _lock:
+        known = _store[api_name]
+        if not keys or any(k not in known for k in keys):
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+        rows = [row for k in dict.fromkeys(keys) for row in known[k]]
+    # 不同的请求值可能对应同一条记录（例如括号不同的公司名称）
+    return list({id(row): row for row in rows}.values())
+
+
+def store(api_name, values, rows):
+    """
+    values 中的每个值都视为已预取，按 GET_APIS 的匹配字段把 rows 分配给对应的值
+    """
+    _, _, field = mirror.GET_APIS[api_name]
+    by_value = {}
+    for row in rows:
+        by_value.setdefault(mirror.normalize_value(row.get(field, "")), []).append(row)
+    with _lock:
+        for value in values:
+            key = mirror.normalize_value(value)
+            _store[api_name][key] = by_value.get(key, [])
+
+
+def clear():
+    with _lock:
+        for known in _store.values():
+            known.clear()
+        _stats.update(hits=0, misses=0)
+
+
+def stats():
+    with _lock:
+        return {"entities": {api_name: len(known) for api_name, known in _store.items()}, **_stats}
+
+
+def collect_entities(questions):
+    """
+    返回 {"companies", "cases", "registers", "parents"}，parents 为问到子公司的公司
+    """
+    import router
+    import templates
+
+    companies, cases, registers, parents = [], [], [], []
+    for q in questions:
+        text = q["question"]
+        if router.classify(text) == router.KNOWLEDGE:
+            continue
+        names = [templates.strip_prefix(m) for m in templates.COMPANY_RE.findall(text)]
+        if not names and not templates.CASE_RE.search(text) and not templates.REGISTER_RE.search(text):
+            m = SUBJECT_RE.match(templates.strip_prefix(text))
+            names = [m.group(1)] if m else []
+        companies += names
+        cases += templates.CASE_RE.findall(text)
+        registers += templates.REGISTER_RE.findall(text)
+        if "子公司" in text:
+            parents += names
+    unique = lambda items: list(dict.fromkeys(items))
+    return {"companies": unique(companies), "cases": unique(cases), "registers": unique(registers),
+            "parents": unique(parents)}
+
+
+def fetch(api_name, values):
+    """
+    分批拉取 values 并保存，返回拉取到的记录数；单批失败只跳过该批
+    """
+    import tools
+
+    _, param, _ = mirror.GET_APIS[api_name]
+    values = list(dict.fromkeys(values))
+    chunks = [values[i:i + CHUNK_SIZE] for i in range(0, len(values), CHUNK_SIZE)]
+
+    def fetch_chunk(chunk):
+        try:
+            rows = tools.http_api_call(api_name, {param: chunk}, use_cache=False)["return"]
+        except Exception as e:
+            print("prefetch error", api_name, e)
+            return 0
+        store(api_name, chunk, rows)
+        return len(rows)
+    return sum(concurrency.thread_map(fetch_chunk, chunks))
+
+
+def warm(questions):
+    """
+    注册号 -> 公司名称、简称 -> 全称先解析（结果进入 law_api 缓存和别名索引），再按实体批量拉取四张表
+    """
+    import tools
+
+    if not ENABLED:
+        return None
+    start = time.time()
+    with tracing.span("prefetch", questions=len(questions)) as s:
+        entities = collect_entities(questions)
+
+        def register_names(register):
+            try:
+                rows = tools.http_api_call("search_company_name_by_register", {"key": "注册号", "value": register})
+                return [row["公司名称"] for row in rows["return"] if row.get("公司名称")]
+            except Exception as e:
+                print("prefetch error", register, e)
+                return []
+        names = entities["companies"] + [n for names in concurrency.thread_map(register_names, entities["registers"])
+                                         for n in names]
+        names = tools.augment_company_name(names) if names else []
+        fetched = fetch("get_company_info", names) + fetch("get_company_register", names)
+        fetched += fetch("get_legal_document", entities["cases"])
+
+        parents = tools.augment_company_name(entities["parents"]) if entities["parents"] else []
+        subs = [sub for subs in concurrency.thread_map(tools.get_sub_company_names, parents) for sub in subs]
+        fetched += fetch("get_sub_company_info", parents + subs)
+
+        summary = {k: len(v) for k, v in entities.items()}
+        summary.update(names=len(names), subs=len(subs), rows=fetched, elapsed=round(time.time() - start, 3))
+        s.set(**summary)
+    print("预取完成：", summary)
+    return summary
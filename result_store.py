@@ -0,0 +1,106 @@
+"""
+大结果集的分页存储。
+
+search_* 工具（@paginated）经 dispatch_tool 返回给模型的结果超过 PAGE_SIZE 条时，只把第一页返回给模型，
+完整结果按会话保存在这里，模型通过不透明的 cursor 按需翻页；直接调用工具函数（sandbox、模板）得到的是全部记录。会话数量、每个会话保存的结果集数量和存活时间都有上限，超出时按最久未使用淘汰。
+"""
+
+import base64
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+PAGE_SIZE = 20  # None 表示不分页
+MAX_SESSIONS = 256
+MAX_RESULTS_PER_SESSION = 32
+TTL = 1800  # 秒
+
+# 当前工具调用所属的会话，由 dispatch_tool 设置
+current_session = contextvars.ContextVar("current_session", default="default")
+
+
+class ResultStore:
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id, rows):
+        # 结果 id 由内容决定，同一会话中相同的结果得到相同的 cursor，录制的 GLM 对话在重跑时键不变
+        payload = json.dumps(rows, ensure_ascii=False, sort_keys=True, default=str)
+        result_id = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            results = self._sessions.setdefault(session_id, OrderedDict())
+            self._sessions.move_to_end(session_id)
+            results[result_id] = (time.time() + TTL, rows)
+            while len(results) > MAX_RESULTS_PER_SESSION:
+                results.popitem(last=False)
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+        return result_id
+
+    def get(self, session_id, result_id):
+        with self._lock:
+            item = self._sessions.get(session_id, {}).get(result_id)
+            if item is None or item[0] < time.time():
+                return None
+            self._sessions.move_to_end(session_id)
+            return item[1]
+
+    def drop_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+_store = ResultStore()
+
+
+def encode_cursor(session_id, result_id, offset, page_size):
+    payload = json.dumps([session_id, result_id, offset, page_size], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+
+
+def _page(session_id, result_id, rows, offset, page_size):
+    end = offset + page_size
+    return {
+        "return_items_count": len(rows),
+        "return": rows[offset:end],
+        "next_cursor": encode_cursor(session_id, result_id, end, page_size) if end < len(rows) else "",
+    }
+
+
+def paginate(rows, page_size=None):
+    """
+    结果不超过一页时原样返回，否则保存完整结果并返回第一页和 next_cursor
+    """
+    page_size = page_size or PAGE_SIZE
+    if not page_size or len(rows) <= page_size:
+        return {"return_items_count": len(rows), "return": rows}
+    session_id = current_session.get()
+    result_id = _store.put(session_id, rows)
+    return _page(session_id, result_id, rows, 0, page_size)
+
+
+def fetch_page(cursor):
+    try:
+        session_id, result_id, offset, page_size = decode_cursor(cursor)
+    except Exception:
+        raise ValueError(f"无效的 cursor: {cursor}")
+    # cursor 只能在创建它的会话中使用
+    if session_id != current_session.get():
+        raise ValueError("cursor 不属于当前会话，请重新查询")
+    rows = _store.get(session_id, result_id)
+    if rows is None:
+        raise ValueError("cursor 对应的结果已过期，请重新查询")
+    return _page(session_id, result_id, rows, offset, page_size)
+
+
+def drop_session(session_id):
+    _store.drop_session(session_id)
@@ -0,0 +1,106 @@
+"""
+进入 agent 循环之前的本地问题路由，只用正则和关键词，不调用模型：
+
+    knowledge  纯法律知识问题，不需要查库，一次不带工具的 call_glm 即可
+    single     一次查询就能回答（按公司名称/案号/注册号取字段）
+    multi      需要多跳或聚合（排序、计数、求和、对比、先查行业再统计等）
+
+把问题错判为 knowledge 会直接得到错误答案，所以规则偏保守：只要出现任何实体或数据字段就不走 knowledge。
+路由的准确率可以用一次关闭路由（LAW_ROUTER=0）的完整运行的检查点来衡量：
+
+    python router.py ./evaluate/checkpoint.jsonl
+"""
+
+import json
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+
+ENABLED = os.environ.get("LAW_ROUTER", "1") != "0"
+
+KNOWLEDGE = "knowledge"
+SINGLE = "single"
+MULTI = "multi"
+ROUTES = (KNOWLEDGE, SINGLE, MULTI)
+
+# 具体实体：案号、注册号/统一社会信用代码、公司全称或常见的简称后缀
+ENTITY_RE = re.compile(
+    r"[(（]\d{4}[)）]"
+    r"|(?<![0-9A-Za-z])[0-9A-Z]{15}(?![0-9A-Za-z])|(?<![0-9A-Za-z])[0-9A-Z]{18}(?![0-9A-Za-z])"
+    r"|有限公司|有限责任公司|有限合伙|股份|集团|科技|电子|医药|药业|银行|证券|控股|实业|能源|材料|装备|智能|光电|食品"
+)
+# 需要查库的字段和问法
+DATA_RE = re.compile(
+    r"子公司|母公司|法定代表人|法人代表|注册|成立|行业|邮箱|地址|电话|网址|代码|简称|英文名称|董秘|总经理|员工"
+    r"|案号|案由|案件|原告|被告|涉案|判决|审理|法院"
+    r"|投资|控股|持股|参股|数量|多少家|几家|哪些公司|哪家|哪个公司|名称是|分别是"
+)
+# 多跳或聚合
+MULTI_RE = re.compile(
+    r"最高|最低|最大|最小|最多|最少|前\s*[\d一二三四五六七八九十]+|排名|多少家|几家|数量|总额|总金额|合计|一共|共有|总共"
+    r"|对比|比较|哪个更|更高|更多|超过|超|以上|以下|不低于|不少于|该行业|同行业|所属的?行业"
+)
+
+
+def classify(query):
+    query = query or ""
+    if not ENTITY_RE.search(query) and not DATA_RE.search(query):
+        return KNOWLEDGE
+    if MULTI_RE.search(query):
+        return MULTI
+    return SINGLE
+
+
+def expected_route(record):
+    """
+    从关闭路由时 agent 的实际运行推断问题类型：没有工具调用为 knowledge，一轮为 single，多轮为 multi
+    """
+    turns = len(record.get("turns") or [])
+    return KNOWLEDGE if turns == 0 else SINGLE if turns == 1 else MULTI
+
+
+def evaluate(records):
+    """
+    records: 检查点中的记录（需包含 question 和 turns）
+    knowledge_precision 最重要：低于 1 说明有需要查库的问题被错误地走了快速路径
+    """
+    confusion = defaultdict(Counter)
+    for record in records:
+        confusion[expected_route(record)][classify(record["question"])] += 1
+    total = sum(sum(c.values()) for c in confusion.values())
+    correct = sum(confusion[r][r] for r in ROUTES)
+    predicted_knowledge = sum(confusion[r][KNOWLEDGE] for r in ROUTES)
+    return {
+        "total": total,
+        "accuracy": correct / total if total else 0.0,
+        "knowledge_precision": confusion[KNOWLEDGE][KNOWLEDGE] / predicted_knowledge if predicted_knowledge else 1.0,
+        "knowledge_recall": confusion[KNOWLEDGE][KNOWLEDGE] / sum(confusion[KNOWLEDGE].values()) if confusion[KNOWLEDGE] else 1.0,
+        "confusion": {expected: dict(predicted) for expected, predicted in confusion.items()},
+    }
+
+
+def route_savings(records):
+    """
+    按路由统计问题数、平均 token 和平均耗时，用于对比快速路径与 agent 循环的开销
+    """
+    groups = defaultdict(list)
+    for record in records:
+        # 模板直接回答的问题单独统计
+        groups["template" if record.get("template") else record.get("route") or "agent"].append(record)
+    return {
+        route: {
+            "questions": len(rs),
+            "avg_tokens": sum(r["tokens"] for r in rs) / len(rs),
+            "avg_elapsed": sum(r.get("elapsed", 0) for r in rs) / len(rs),
+        }
+        for route, rs in groups.items()
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "./evaluate/checkpoint.jsonl"
+    records = [json.loads(line) for line in open(path, "r", encoding="utf-8") if line.strip()]
+    print(json.dumps(evaluate(records), ensure_ascii=False, indent=2))
+    print(json.dumps(route_savings(records), ensure_ascii=False, indent=2))
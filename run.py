@@ -1,14 +1,31 @@
-from tools import get_tools, dispatch_tool
+from tools import get_tools, dispatch_tool, adispatch_tool
 from utils import multi_thread_excute
 from zhipuai import ZhipuAI
 from pprint import pprint
+import asyncio
+import concurrency
+import httpx
+import upstream
+import glm_cache
 import json
 import logging
 import time
+import hashlib
+import result_store
+import compaction
+import router
+import templates
+import prefetch
+import tracing
+from checkpoint import Checkpoint
 from schema import database_schema
 
 
-client = ZhipuAI(api_key="") # 填写你的API Key
+_glm_policy = upstream.get("glm")
+# 重试与超时由 upstream 统一处理，关闭 SDK 自带的立即重试
+client = ZhipuAI(api_key="",  # 填写你的API Key
+                 max_retries=0,
+                 timeout=httpx.Timeout(_glm_policy.read_timeout, connect=_glm_policy.connect_timeout))
 
 system_prompt = """你是一位金融法律专家，你的任务是根据用户给出的query，调用给出的工具接口，获得用户想要查询的答案。
 所提供的工具接口可以查询四张数据表的信息，数据表的schema如下:
@@ -18,7 +35,9 @@ system_prompt = """你是一位金融法律专家，你的任务是根据用户
 def call_glm(messages, model="glm-4",
              temperature=0.95,
              tools=None):
-    response = client.chat.completions.create(
+    # 录制/回放缓存命中时不访问 GLM
+    response = glm_cache.completion(
+        lambda **kwargs: upstream.call("glm", lambda: client.chat.completions.create(**kwargs)),
         model=model,  # 填写需要调用的模型名称
         messages=messages,
         temperature=temperature,
@@ -26,11 +45,104 @@ def call_glm(messages, model="glm-4",
         tools=tools,
     )
     # print(messages)
-    print(response.json())
+    if tracing.VERBOSE:
+        tracing.vprint(response.json())
     return response
 
 
-def run(query, tools):
+async def acall_glm(messages, model="glm-4",
+                    temperature=0.95,
+                    tools=None):
+    return await concurrency.to_thread("glm", call_glm, messages, model=model, temperature=temperature, tools=tools)
+
+
+knowledge_prompt = "你是一个法律专家，请根据你的专业知识回答用户的问题"
+
+
+async def _aknowledge(query, stats):
+    messages = [
+        {"role": "system", "content": knowledge_prompt},
+        {"role": "user", "content": query}
+    ]
+    response = await acall_glm(messages, tools=None)
+    stats["prompt_tokens"] += response.usage.prompt_tokens
+    return response.usage.total_tokens, [{"content": response.choices[0].message.content, "role": "assistant"}], response
+
+
+template_prompt = "请根据查询结果，用简洁的中文完整回答用户的问题，不要编造查询结果之外的信息"
+
+
+async def _amatch_template(query):
+    if not templates.ENABLED:
+        return None
+    try:
+        return await concurrency.to_thread("law_api", templates.match, query)
+    except Exception as e:
+        # 模板查询失败时交给 agent 处理
+        print("template error", e)
+        return None
+
+
+async def _atemplate(query, matched, stats):
+    '''
+    模板已经查到答案：默认直接返回模板答案，LAW_TEMPLATE_PHRASE=1 时用一次不带工具的 call_glm 组织语言
+    '''
+    stats["template"] = matched["template"]
+    if not templates.PHRASE_WITH_LLM:
+        return 0, [{"content": matched["answer"], "role": "assistant"}], None
+    messages = [
+        {"role": "system", "content": template_prompt},
+        {"role": "user", "content": f"问题：{query}\n查询结果：{json.dumps(matched['facts'], ensure_ascii=False)}"}
+    ]
+    response = await acall_glm(messages, tools=None)
+    stats["prompt_tokens"] += response.usage.prompt_tokens
+    return response.usage.total_tokens, [{"content": response.choices[0].message.content, "role": "assistant"}], response
+
+
+def make_session_id(query, question_id=None):
+    '''
+    会话 id 由问题决定而不是随机生成：分页 cursor 中包含会话 id，录制的 GLM 对话在重跑时才能得到相同的缓存键
+    '''
+    if question_id is not None:
+        return f"q{question_id}"
+    return "h" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+
+
+async def arun(query, tools, stats=None, session_id=None):
+    '''
+    stats: 可选的dict，用于收集该问题的运行统计，turns为每轮工具调用的并发数(fan_out)和耗时(wall_time)，
+           prompt_tokens为实际消耗的prompt token数，prompt_tokens_saved为上下文压缩节省的prompt token数（估计），
+           route为router的分类结果（knowledge/single/multi，关闭路由时为None），template为命中的模板名称
+    session_id: 分页结果所属的会话，默认由query生成；同时运行的问题需要使用不同的会话
+    '''
+    stats = {} if stats is None else stats
+    stats.setdefault("turns", [])
+    stats.setdefault("prompt_tokens", 0)
+    # 上下文压缩节省的prompt token数（本地估计）
+    stats.setdefault("prompt_tokens_saved", 0)
+    # 每个问题使用独立的会话，问题结束后释放该会话保存的分页结果
+    session_id = session_id or make_session_id(query)
+    try:
+        with tracing.span("question", query=query[:100]) as s:
+            # 纯知识问题不需要查库，跳过 schema 和工具定义，直接一次回答
+            stats["route"] = router.classify(query) if router.ENABLED else None
+            s.set(route=stats["route"])
+            matched = None
+            if stats["route"] == router.KNOWLEDGE:
+                tokens_count, messages, response = await _aknowledge(query, stats)
+            else:
+                matched = await _amatch_template(query)
+            if matched:
+                tokens_count, messages, response = await _atemplate(query, matched, stats)
+            elif stats["route"] != router.KNOWLEDGE:
+                tokens_count, messages, response = await _arun(query, tools, session_id, stats)
+            s.set(tokens=tokens_count, prompt_tokens=stats["prompt_tokens"], rounds=len(stats["turns"]) + 1)
+            return tokens_count, messages, response
+    finally:
+        result_store.drop_session(session_id)
+
+
+async def _arun(query, tools, session_id, stats):
     tokens_count = 0
     messages = [
         {"role": "system", "content": system_prompt},
@@ -38,70 +150,195 @@ def run(query, tools):
     ]
 
     for i in range(10):
-        print(f"##第{i}轮对话##")
-        pprint(messages)
-        print("#" * 10)
-        print("\n")
+        tracing.vprint(f"##第{i}轮对话##")
+        if tracing.VERBOSE:
+            pprint(messages)
+        tracing.vprint("#" * 10)
+        tracing.vprint("\n")
 
-        for _ in range(3):
-            try:
-                response = call_glm(messages, tools=tools)
+        try:
+            with tracing.span("llm_round", round=i) as s:
+                # 只压缩本轮请求的上下文，messages 中保留完整历史
+                request_messages, before, after = compaction.compact(messages)
+                stats["prompt_tokens_saved"] += before - after
+                if tracing.ENABLED:
+                    s.set(request_bytes=len(json.dumps(request_messages, ensure_ascii=False).encode("utf-8")))
+                response = await acall_glm(request_messages, tools=tools)
                 tokens_count += response.usage.total_tokens
+                stats["prompt_tokens"] += response.usage.prompt_tokens
+                s.set(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
                 messages.append(response.choices[0].message.model_dump())
-                break
-            except Exception as e:
-                print(e)
-                
+        except glm_cache.GLMCacheMiss:
+            # 回放模式下没有录制的请求，换成知识回答也同样没有录制
+            raise
+        except Exception as e:
+            # upstream 已经按策略重试过，这里不能再用上一轮的 response 继续执行工具调用
+            print("glm error", e)
+            knowledge_tokens, messages, _ = await _aknowledge(query, stats)
+            return tokens_count + knowledge_tokens, messages, None
+
         try:
             if response.choices[0].finish_reason == "tool_calls":
-                tools_call = response.choices[0].message.tool_calls[0]
-                tool_name = tools_call.function.name
-                args = tools_call.function.arguments
-                obs = dispatch_tool(tool_name, args, "007")
-                messages.append({
-                    "role": "tool", 
-                    "content": f"{obs}",
-                    "tool_id": tools_call.id
-                })
+                # 同一轮的所有工具调用并发执行，结果按tool_call_id与调用一一对应
+                tool_calls = response.choices[0].message.tool_calls
+                turn_start = time.time()
+                with tracing.span("tool_turn", round=i, fan_out=len(tool_calls)):
+                    observations = await asyncio.gather(*[
+                        adispatch_tool(tools_call.function.name, tools_call.function.arguments, session_id)
+                        for tools_call in tool_calls
+                    ])
+                stats["turns"].append({"round": i, "fan_out": len(tool_calls), "wall_time": time.time() - turn_start})
+                for tools_call, obs in zip(tool_calls, observations):
+                    messages.append({
+                        "role": "tool",
+                        "content": f"{obs}",
+                        "tool_call_id": tools_call.id
+                    })
             else:
-                print("###对话结束###")
+                tracing.vprint("###对话结束###")
                 break
         except Exception as e:
-            messages = [
-                {"role": "system", "content": "你是一个法律专家，请根据你的专业知识回答用户的问题"},
-                {"role": "user", "content": query}
-            ]
-            response = call_glm(messages, tools=None)
-            return tokens_count, [{"content": response.choices[0].message.content, "role": "assistant"}], None
+            knowledge_tokens, messages, _ = await _aknowledge(query, stats)
+            return tokens_count + knowledge_tokens, messages, None
         
     return tokens_count, messages, response
 
 
-def run_all():
+def run(query, tools, stats=None, session_id=None):
+    return asyncio.run(arun(query, tools, stats, session_id))
+
+
+QUESTIONS_PATH = "./question_junior_A.json"
+
+
+def load_questions(path=QUESTIONS_PATH):
+    return [json.loads(i) for i in open(path, "r", encoding="utf-8").readlines() if i.strip()]
+
+
+CHECKPOINT_PATH = "./evaluate/checkpoint.jsonl"
+SUBMISSION_PATH = "./evaluate/sub.json"
+TRACE_PATH = "./evaluate/trace.jsonl"
+CHROME_TRACE_PATH = "./evaluate/trace.chrome.json"
+
+
+def save_results(all_results, start, checkpoint):
+    all_tokens_count = sum([i[0] for i in all_results])
+    print("使用tokens总数：", all_tokens_count, "用时", time.time() - start, "s")
+    turns = [turn for i in all_results for turn in i[2]["turns"]]
+    if turns:
+        print("工具调用轮数：", len(turns), "平均每轮并发数：", sum(t["fan_out"] for t in turns) / len(turns),
+              "平均每轮耗时：", sum(t["wall_time"] for t in turns) / len(turns), "s")
+    saved = sum(i[2]["prompt_tokens_saved"] for i in all_results)
+    print("上下文压缩节省prompt tokens（估计）：", saved, "实际prompt tokens：", sum(i[2]["prompt_tokens"] for i in all_results))
+    if prefetch.ENABLED:
+        print("预取命中：", prefetch.stats())
+    for route, summary in router.route_savings([i[1] for i in all_results]).items():
+        print("路由", route, "问题数：", summary["questions"], "平均tokens：", summary["avg_tokens"],
+              "平均耗时：", summary["avg_elapsed"], "s")
+    if tracing.ENABLED:
+        tracing.export_jsonl(TRACE_PATH)
+        tracing.export_chrome(CHROME_TRACE_PATH)
+    # 提交文件由检查点合并生成，包含之前运行中已经完成的问题
+    records = checkpoint.merge(SUBMISSION_PATH)
+    print("已完成问题数：", len(records), "累计使用tokens：", sum(r["tokens"] for r in records))
+
+
+def pending_questions(checkpoint, resume, questions_path=QUESTIONS_PATH):
+    lines = load_questions(questions_path)
+    if not resume:
+        return lines
+    answered = checkpoint.answered_ids()
+    print("跳过已完成的问题：", len(answered))
+    return [line for line in lines if line["id"] not in answered]
+
+
+def make_record(line, tokens_count, messages, stats, start):
+    return {
+        "id": line["id"],
+        "question": line["question"],
+        "answer": messages[-1]["content"],
+        "tokens": tokens_count,
+        "elapsed": time.time() - start,
+        "turns": stats["turns"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "prompt_tokens_saved": stats["prompt_tokens_saved"],
+        "route": stats.get("route"),
+        "template": stats.get("template"),
+    }
+
+
+def run_all(parralle_num=20, timeout=None, resume=True, checkpoint_path=CHECKPOINT_PATH, questions_path=QUESTIONS_PATH):
+    '''
+    同时运行的问题不超过parralle_num个；timeout为单个问题的超时时间（秒），超时的问题不写入结果，
+    其线程会在后台跑完并一直占用名额
+    每个问题完成后立即由主线程写入检查点，resume=True时跳过检查点中已经回答过的问题
+    '''
     tools = get_tools()
     start = time.time()
     # pprint(tools)
 
+    checkpoint = Checkpoint(checkpoint_path)
     # 读取lines
-    lines = [i for i in open("./question_junior_A.json", "r", encoding="utf-8").readlines() if i.strip()]
+    lines = pending_questions(checkpoint, resume, questions_path)
+    # 所有问题涉及的实体先批量拉取
+    prefetch.warm(lines)
 
     def task(line):
-        line = json.loads(line)
         query = line["question"]
 
-        tokens_count, messages, response = run(query, tools)
-        ans = messages[-1]["content"]
-        return tokens_count, {
-            "id": line["id"],
-            "question": query,
-            "answer": ans
-        }
+        stats = {}
+        task_start = time.time()
+        try:
+            tokens_count, messages, response = run(query, tools, stats, make_session_id(query, line["id"]))
+        except glm_cache.GLMCacheMiss as e:
+            # 回放模式下只跳过没有录制的问题，不影响其他问题
+            print("task skipped", line["id"], "glm cache miss", e)
+            return None
+        return tokens_count, make_record(line, tokens_count, messages, stats, task_start), stats
 
-    all_results = multi_thread_excute([[task, line] for line in lines], 20)
-    all_tokens_count = sum([i[0] for i in all_results])
-    print("使用tokens总数：", all_tokens_count, "用时", time.time() - start, "s")
-    all_results_json = sorted([i[1] for i in all_results], key=lambda x: x["id"])
-    open("./evaluate/sub.json", "w", encoding="utf-8").write("\n".join([json.dumps(line, ensure_ascii=False) for line in all_results_json]))
+    def on_result(result):
+        if result is not None:
+            checkpoint.append(result[1])
+
+    # 检查点只在主线程中写入，超时问题的线程之后才完成时不会再写入
+    all_results = multi_thread_excute([[task, line] for line in lines], parralle_num, timeout=timeout,
+                                      on_result=on_result)
+    all_results = [i for i in all_results if i is not None]
+    save_results(all_results, start, checkpoint)
+
+
+async def arun_all(max_in_flight=200, timeout=None, resume=True, checkpoint_path=CHECKPOINT_PATH, questions_path=QUESTIONS_PATH):
+    '''
+    单线程事件循环中同时处理最多max_in_flight个问题，实际的law_api/GLM并发由concurrency中的全局信号量控制
+    timeout为单个问题的超时时间（秒），超时的问题会被取消且不写入结果
+    '''
+    tools = get_tools()
+    start = time.time()
+    checkpoint = Checkpoint(checkpoint_path)
+    lines = pending_questions(checkpoint, resume, questions_path)
+    await concurrency.to_thread("law_api", prefetch.warm, lines)
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def task(line):
+        async with in_flight:
+            query = line["question"]
+            stats = {}
+            task_start = time.time()
+            try:
+                tokens_count, messages, response = await asyncio.wait_for(
+                    arun(query, tools, stats, make_session_id(query, line["id"])), timeout)
+            except asyncio.TimeoutError:
+                print("task skipped", line["id"], "timeout")
+                return None
+            except glm_cache.GLMCacheMiss as e:
+                print("task skipped", line["id"], "glm cache miss", e)
+                return None
+            record = make_record(line, tokens_count, messages, stats, task_start)
+            checkpoint.append(record)
+            return tokens_count, record, stats
+
+    all_results = [i for i in await asyncio.gather(*[task(line) for line in lines]) if i is not None]
+    save_results(all_results, start, checkpoint)
 
 
 if __name__ == '__main__':
@@ -1,14 +1,29 @@
+import inspect
+from enum import Enum
+
 from zhipuai import ZhipuAI
 from schema import database_schema
+import httpx
+import upstream
+import glm_cache
+import sandbox
+import tracing
+import run as agent
+import tools as law_tools
 
 
-client = ZhipuAI(api_key="")
+_glm_policy = upstream.get("glm")
+client = ZhipuAI(api_key="",
+                 max_retries=0,
+                 timeout=httpx.Timeout(_glm_policy.read_timeout, connect=_glm_policy.connect_timeout))
 
 
 def call_glm(messages, model="glm-4",
              temperature=0.95,
              tools=None):
-    response = client.chat.completions.create(
+    # 录制/回放缓存命中时不访问 GLM
+    response = glm_cache.completion(
+        lambda **kwargs: upstream.call("glm", lambda: client.chat.completions.create(**kwargs)),
         model=model,  # 填写需要调用的模型名称
         messages=messages,
         temperature=temperature,
@@ -19,154 +34,49 @@ def call_glm(messages, model="glm-4",
     return response
 
 
+def describe_function(func):
+    """
+    按函数的真实签名生成说明：参数类型、默认值和参数说明都取自 Annotated 注解，枚举参数列出可选值
+    """
+    params, lines = [], []
+    for name, param in inspect.signature(func).parameters.items():
+        typo, (description, required) = param.annotation.__origin__, param.annotation.__metadata__
+        if isinstance(typo, type) and issubclass(typo, Enum):
+            typ = "str"
+            description += "，可选值：" + "、".join(str(e.value) for e in typo)
+        else:
+            typ = getattr(typo, "__name__", str(typo))
+        default = "" if param.default is inspect.Parameter.empty else f" = {param.default!r}"
+        params.append(f"{name}: {typ}{default}")
+        lines.append(f"    {name}: {description}{'' if required else '（可选）'}")
+    doc = "\n    ".join(inspect.getdoc(func).splitlines())
+    return f"def {func.__name__}({', '.join(params)}):\n    '''\n    {doc}\n" + "\n".join(lines) + "\n    '''"
+
+
+def describe_tools():
+    """
+    sandbox 中可以直接调用的工具函数；直接调用时 search_* 返回全部结果，不需要 fetch_next_page 翻页
+    """
+    funcs = [getattr(law_tools, t["function"]["name"]) for t in law_tools.get_tools()
+             if t["function"]["name"] != "fetch_next_page"]
+    return "\n\n".join(describe_function(func) for func in funcs)
+
+
 system_prompt = """
 【任务要求】
 你是一位专业的python开发工程师，你将根据用户的需求，使用python语言编写代码解决用户提出的问题。请仅仅返回python代码。
 注意：
 1. 你的代码必须使用python语言编写，并且必须符合python语法规范。
 2. 你将使用已经编写好的python函数来解决用户的问题，不要使用已经提供好的函数或者内置函数之外的函数。
-3. 你写好的代码将会被执行
-
-【已经写好的python代码】
-def http_api_call(api_name, data, max_data_len=None):
-    url = f"{domain}/law_api/{api_name}"
-    
-    rsp = requests.post(url, json=data, headers=headers)
-    final_rsp = rsp.json()
-    final_rsp = [final_rsp] if isinstance(final_rsp, dict) else final_rsp
-    
-    if max_data_len is None:
-        max_data_len = len(final_rsp)
-    return {
-        "return_items_count": len(final_rsp),
-        "return": final_rsp[:max_data_len]
-    }
-
-
-def get_company_name_by_bref(bref):
-    company_names = [i["公司名称"] for i in http_api_call("search_company_name_by_info", {"key": "公司简称", "value": bref})["return"]]
-    return company_names
-
-
-def get_company_name_by_en(bref):
-    company_names = [i["公司名称"] for i in http_api_call("search_company_name_by_info", {"key": "英文名称", "value": bref})["return"]]
-    return company_names
-
-
-def augment_company_name(company_name):
-    company_name = company_name if isinstance(company_name, list) else [company_name]
-    for c in company_name[:]:
-        company_name += get_company_name_by_bref(c)
-        company_name += get_company_name_by_en(c)
-        company_name += [c.replace("(", "（").replace(")", "）")]
-        company_name += [c.replace("（", "(").replace("）", ")")]
-
-    return list(set(company_name))
-
+3. 你写好的代码将会被执行，用print输出的内容作为答案
 
-@register_tool
-def get_company_info(
-        company_name: Annotated[list, "公司名称或简称的列表", True],
-) -> List[CompanyInfo]:
-    '''
-    根据公司名称获得该公司所有基本信息，可以传入多个公司名称，返回一个列表
-    '''
-    company_name = augment_company_name(company_name)
-    return http_api_call("get_company_info", {"company_name": company_name})
-
-
-@register_tool
-def get_company_register(
-        company_name: Annotated[list, "公司名称或简称的列表", True],
-) -> List[CompanyRegister]:
-    '''
-    根据公司名称获得该公司所有注册信息，可以传入多个公司名称，返回一个列表
-    '''
-    company_name = augment_company_name(company_name)
-    return http_api_call("get_company_register", {"company_name": company_name})
-
-
-@register_tool
-def get_sub_company_info(
-        company_name: Annotated[list, "母公司名称的列表", True],
-) -> SubCompanyInfo:
-    '''
-    根据母公司名称获得该母公司所有的关联投资、母公司等信息，可以传入多个母公司名称，返回一个列表
-    '''
-    company_name = augment_company_name(company_name)
-    all_subs = company_name[:]
-    for comp_name in company_name:
-        # print("@@@", http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": comp_name})["return"])
-        all_subs += [i["公司名称"] for i in http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": comp_name}, max_data_len=None)["return"]]
-        # print("!", all_subs)
-    print(all_subs)
-    return http_api_call("get_sub_company_info", {"company_name": all_subs})
-
-@register_tool
-def get_sub_company_info_by_sub_comp(
-        company_name: Annotated[list, "子公司名称的列表", True],
-) -> SubCompanyInfo:
-    '''
-    根据子公司名称获得该子公司所有的关联投资等信息，可以传入多个子公司名称，返回一个列表
-    '''
-    company_name = augment_company_name(company_name)
-    return http_api_call("get_sub_company_info", {"company_name": company_name})
+【已经写好的python函数】
+get_*和search_*函数返回{"return_items_count": 记录数, "return": 记录列表}，search_*返回全部满足条件的记录。
 
+{functions}
 
-@register_tool
-def get_legal_document(
-        case_num: Annotated[list, "案号", True],
-) -> List[LegalDocument]:
-    '''
-    根据案号查询相关法律文书的内容，可以传入多个案号，返回一个列表
-    '''
-    return http_api_call("get_legal_document", {"case_num": case_num})
-
-
-@register_tool
-def search_company_name_by_info(
-        key: Annotated[CompanyInfoEnum, "公司基本信息字段名称", True],
-        value: Annotated[str, "公司基本信息字段具体的值", True],
-) -> str:
-    '''
-    根据公司某个基本信息字段是某个值时，查询所有满足条件的公司名称
-    '''
-    return http_api_call("search_company_name_by_info", {"key": key, "value": value})
-
-
-@register_tool
-def search_company_name_by_register(
-        key: Annotated[CompanyRegisterEnum, "公司注册信息字段名称", True],
-        value: Annotated[str, "公司注册信息字段具体的值", True],
-) -> str:
-    '''
-    根据公司某个注册信息字段是某个值时，查询所有满足条件的公司名称
-    '''
-    return http_api_call("search_company_name_by_register", {"key": key, "value": value})
-
-
-@register_tool
-def search_company_name_by_sub_info(
-        key: Annotated[SubCompanyInfoEnum, "子公司融资信息字段名称", True],
-        value: Annotated[str, "子公司融资信息信息字段具体的值", True],
-) -> str:
-    '''
-    根据子公司融资信息字段是某个值时，查询所有满足条件的子公司名称
-    '''
-    return http_api_call("search_company_name_by_sub_info", {"key": key, "value": value})
-
-
-@register_tool
-def search_case_num_by_legal_document(
-        key: Annotated[LegalDocumentEnum, "法律文书信息字段名称", True],
-        value: Annotated[str, "法律文书信息字段具体的值", True],
-) -> str:
-    '''
-    根据法律文书信息字段是某个值时，查询所有满足条件的法律文书案号
-    '''
-    return http_api_call("search_case_num_by_legal_document", {"key": key, "value": value})
 【注意】仅仅输出python代码
-"""
+""".replace("{functions}", describe_tools())
 # 【可以查询到的数据库schema】
 # """ + database_schema
 
@@ -188,5 +98,24 @@ def run(query, model="glm-4"):
     return call_glm(messages, model=model, tools=None)
 
 
+def solve(query, model="glm-4"):
+    '''
+    一轮 GLM 生成代码并在 sandbox 中执行，stdout 作为答案；代码执行失败或没有输出时退回多轮的 run.run
+    返回 (答案, tokens数, "sandbox"或"agent")
+    '''
+    response = run(query, model)
+    tokens_count = response.usage.total_tokens
+    code = sandbox.extract_code(response.choices[0].message.content)
+    with tracing.span("sandbox", code_bytes=len(code.encode("utf-8"))) as s:
+        ok, output = sandbox.execute(code)
+        s.set(ok=ok, output_bytes=len(output.encode("utf-8")))
+    if ok and output.strip():
+        return output.strip(), tokens_count, "sandbox"
+
+    tracing.vprint("sandbox 执行失败，退回 agent：", output)
+    agent_tokens, messages, _ = agent.run(query, agent.get_tools())
+    return messages[-1]["content"], tokens_count + agent_tokens, "agent"
+
+
 if __name__ == "__main__":
     print(run("请问批发业注册资本最高的前3家公司的名称以及他们的注册资本（单位为万元）？", model="glm-4"))
\ No newline at end of file
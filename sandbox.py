@@ -0,0 +1,231 @@
+"""
+执行 run_v2 生成代码的预热进程池：每个工作进程启动时就导入 tools，代码在其中 exec，打印到 stdout 的内容作为答案。
+
+    ok, output = sandbox.execute(code)     # ok 为 False 时 output 是错误信息
+
+每个任务有墙钟超时（超时的进程被杀掉并重新拉起）和 CPU 时间上限，工作进程整体有内存上限（RLIMIT_AS）。
+这只是资源隔离，不是安全边界：生成的代码仍然可以访问网络和文件系统。
+"""
+
+import io
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import threading
+import traceback
+from contextlib import redirect_stdout
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource，不限制 CPU 和内存
+    resource = None
+
+
+POOL_SIZE = int(os.environ.get("LAW_SANDBOX_WORKERS", "4"))
+WALL_TIMEOUT = 60  # 秒，单个任务的墙钟超时
+CPU_SECONDS = 20  # 秒，单个任务的 CPU 时间上限
+MEMORY_MB = 2048  # 每个工作进程的地址空间上限，None 表示不限制
+WARMUP_TIMEOUT = 60  # 秒，等待工作进程导入 tools 的时间
+MAX_OUTPUT_CHARS = 20000
+
+_CODE_BLOCK = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.S)
+
+
+def extract_code(text):
+    """
+    从模型回复中取出 python 代码：有代码块时拼接所有代码块，否则认为整段回复都是代码
+    """
+    blocks = _CODE_BLOCK.findall(text or "")
+    return "\n".join(blocks) if blocks else (text or "")
+
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded("CPU 时间超过上限")
+
+
+def _parent_settings(size):
+    """
+    工作进程用 spawn 启动，需要把父进程中修改过的配置带过去
+    """
+    import cache
+    import mirror
+    import tools
+    import upstream
+
+    law_api = upstream.get("law_api").bucket
+    return {
+        "domain": tools.domain,
+        "cache": {"enabled": cache.ENABLED, "memory_max_items": cache.MEMORY_MAX_ITEMS, "memory_ttl": cache.MEMORY_TTL,
+                  "disk_path": cache.DISK_PATH, "disk_ttl": cache.DISK_TTL},
+        "mirror": {"mode": mirror.MODE, "path": mirror.PATH},
+        # 全局限速平分给各个工作进程
+        "law_api_rate": law_api.rate / size if law_api.rate else law_api.rate,
+        "law_api_burst": max(1, law_api.burst // size),
+    }
+
+
+def _apply_settings(settings):
+    import cache
+    import mirror
+    import tools
+    import upstream
+
+    tools.domain = settings["domain"]
+    cache.configure(**settings["cache"])
+    mirror.configure(**settings["mirror"])
+    bucket = upstream.get("law_api").bucket
+    bucket.rate, bucket.burst = settings["law_api_rate"], settings["law_api_burst"]
+    return {name: getattr(tools, name) for name in dir(tools) if not name.startswith("_")}
+
+
+def _run_job(code, namespace, cpu_seconds):
+    if resource is not None and cpu_seconds:
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        limit = int(used.ru_utime + used.ru_stime) + cpu_seconds
+        resource.setrlimit(resource.RLIMIT_CPU, (limit if hard == resource.RLIM_INFINITY else min(limit, hard), hard))
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            exec(compile(code, "<generated>", "exec"), dict(namespace))
+        return True, out.getvalue()[:MAX_OUTPUT_CHARS]
+    except BaseException:
+        return False, (out.getvalue()[-2000:] + traceback.format_exc(limit=5))[-MAX_OUTPUT_CHARS:]
+    finally:
+        if resource is not None and cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _worker(conn, settings, memory_mb):
+    if resource is not None:
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    namespace = _apply_settings(settings)
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        code, cpu_seconds = job
+        conn.send(_run_job(code, namespace, cpu_seconds))
+
+
+class _Worker:
+    def __init__(self, ctx, settings, memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker, args=(child_conn, settings, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise TimeoutError("sandbox 工作进程启动超时")
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class SandboxPool:
+    def __init__(self, size=POOL_SIZE, wall_timeout=WALL_TIMEOUT, cpu_seconds=CPU_SECONDS, memory_mb=MEMORY_MB):
+        self.size = size
+        self.wall_timeout = wall_timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._ctx = multiprocessing.get_context("spawn")
+        self._settings = _parent_settings(size)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "errors": 0, "timeouts": 0, "restarts": 0}
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        return _Worker(self._ctx, self._settings, self.memory_mb)
+
+    def _count(self, **kwargs):
+        with self._lock:
+            for k, v in kwargs.items():
+                self.stats[k] += v
+
+    def execute(self, code):
+        """
+        返回 (是否成功, stdout 或错误信息)
+        """
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(WARMUP_TIMEOUT)
+            worker.conn.send((code, self.cpu_seconds))
+            if not worker.conn.poll(self.wall_timeout):
+                raise TimeoutError(f"执行超过 {self.wall_timeout}s")
+            ok, output = worker.conn.recv()
+        except (TimeoutError, EOFError, OSError) as e:
+            # 超时、超内存被杀或管道断开：换一个新的工作进程
+            worker.kill()
+            worker = self._spawn()
+            self._count(jobs=1, errors=1, restarts=1, timeouts=int(isinstance(e, TimeoutError)))
+            return False, f"{type(e).__name__}: {e}"
+        finally:
+            self._idle.put(worker)
+        self._count(jobs=1, errors=int(not ok))
+        return ok, output
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(POOL_SIZE, WALL_TIMEOUT, CPU_SECONDS, MEMORY_MB)
+        return _pool
+
+
+def execute(code):
+    return get_pool().execute(code)
+
+
+def configure(size=None, wall_timeout=None, cpu_seconds=None, memory_mb=-1):
+    """
+    修改配置并关闭现有的进程池，下次 execute 时按新配置重新启动；memory_mb 传 None 表示不限制内存
+    """
+    global POOL_SIZE, WALL_TIMEOUT, CPU_SECONDS, MEMORY_MB, _pool
+    with _pool_lock:
+        POOL_SIZE = POOL_SIZE if size is None else size
+        WALL_TIMEOUT = WALL_TIMEOUT if wall_timeout is None else wall_timeout
+        CPU_SECONDS = CPU_SECONDS if cpu_seconds is None else cpu_seconds
+        MEMORY_MB = MEMORY_MB if memory_mb == -1 else memory_mb
+        if _pool is not None:
+            _pool.close()
+        _pool = None
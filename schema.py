@@ -85,6 +85,11 @@ SubCompanyInfoEnum = build_enum_class(SubCompanyInfo, exclude_enums=["公司名
 LegalDocumentEnum = build_enum_class(LegalDocument, exclude_enums=["案号"])
 
 
+TableEnum = Enum("TableEnum", {name: name for name in ["CompanyInfo", "CompanyRegister", "SubCompanyInfo", "LegalDocument"]})
+
+NumericOperationEnum = Enum("NumericOperationEnum", {name: name for name in ["count", "sum", "top_k"]})
+
+
 def build_enum_list(enum_class): return [enum.value for enum in enum_class]
 
 
@@ -0,0 +1,205 @@
+"""
+标识符查询类问题的模板执行器：用正则从问题中取出注册号、案号或公司名称以及要查询的字段，
+直接调用对应的工具得到答案，不经过多轮的 agent 循环。
+
+    matched = templates.match(query)    # 没有模板能完整覆盖问题时返回 None，由 agent 处理
+    matched["answer"]                   # 按模板拼出的答案
+    matched["facts"]                    # 查询到的原始字段，LAW_TEMPLATE_PHRASE=1 时交给 GLM 组织语言
+
+模板只在能确定问题全部诉求时才命中：字段认不全、出现聚合/多跳问法、查不到数据时都返回 None。
+"""
+
+import os
+import re
+
+import router
+import tools
+from columns import parse_number
+
+
+ENABLED = os.environ.get("LAW_TEMPLATES", "1") != "0"
+PHRASE_WITH_LLM = os.environ.get("LAW_TEMPLATE_PHRASE", "") == "1"
+
+CASE_RE = re.compile(r"[(（]\d{4}[)）][一-龥\d]+?\d+号")
+REGISTER_RE = re.compile(r"(?<![0-9A-Za-z])\d{15}(?![0-9A-Za-z])")
+COMPANY_RE = re.compile(r"[一-龥（）()A-Za-z]{2,40}?(?:股份有限公司|有限责任公司|有限公司)")
+PREFIX_RE = re.compile(r"^(?:请问|请核查|请查询|请提供|请告知|请告诉我|请|我想要|我想|想要|了解|查询|查找|查下|找下|咨询下|问下"
+                       r"|查一下|一下|帮我|你知道|你能|能否|可否|告诉我|关于|在|，|,|、)+")
+SHORT_NAME_RE = re.compile(r"^([一-龥A-Za-z]{2,10}?)(?:的|这家|公司的)")
+
+# 问法 -> (表, 字段)，按顺序匹配，匹配过的文字会被去掉，所以较长的问法放在前面
+FIELD_KEYWORDS = [
+    ("统一社会信用代码", "CompanyRegister", "统一社会信用代码"),
+    ("组织机构代码", "CompanyRegister", "组织机构代码"),
+    ("注册资本", "CompanyRegister", "注册资本"),
+    ("成立日期|成立的?(?:准确|具体)?日期|成立时间|成立日|何时成立|哪一?年成立", "CompanyRegister", "成立日期"),
+    ("登记状态|登记状况|登记情况", "CompanyRegister", "登记状态"),
+    ("企业类型|公司类型|企业性质|企业类别", "CompanyRegister", "企业类型"),
+    ("参保人数", "CompanyRegister", "参保人数"),
+    ("曾用名", "CompanyRegister", "曾用名"),
+    ("法定代表人|法人代表|法人", "CompanyInfo", "法人代表"),
+    ("注册地址|注册地", "CompanyInfo", "注册地址"),
+    ("办公地址|办公地点", "CompanyInfo", "办公地址"),
+    ("电子邮箱地址|电子邮件地址|邮箱地址|电子邮箱|电子邮件|邮箱", "CompanyInfo", "电子邮箱"),
+    ("联系电话|联系方式|电话", "CompanyInfo", "联系电话"),
+    ("官方网址|官网|网址", "CompanyInfo", "官方网址"),
+    ("邮政编码|邮编", "CompanyInfo", "邮政编码"),
+    ("总经理", "CompanyInfo", "总经理"),
+    ("董秘|董事会秘书", "CompanyInfo", "董秘"),
+    ("所属行业|行业", "CompanyInfo", "所属行业"),
+    ("英文名称", "CompanyInfo", "英文名称"),
+    ("上市日期", "CompanyInfo", "上市日期"),
+    ("主营业务", "CompanyInfo", "主营业务"),
+    ("原告律师", "LegalDocument", "原告律师"),
+    ("被告律师", "LegalDocument", "被告律师"),
+    ("原告", "LegalDocument", "原告"),
+    ("被告", "LegalDocument", "被告"),
+    ("案由|诉讼理由|诉讼事由|纠纷类型", "LegalDocument", "案由"),
+    ("法律条文|法条|审理依据|法律依据", "LegalDocument", "审理法条依据"),
+    ("涉案金额", "LegalDocument", "涉案金额"),
+    ("判决结果|判决结论", "LegalDocument", "判决结果"),
+    ("胜诉方|胜诉", "LegalDocument", "胜诉方"),
+    ("文书类型", "LegalDocument", "文书类型"),
+]
+_FIELD_PATTERNS = [(re.compile(pattern), table, field) for pattern, table, field in FIELD_KEYWORDS]
+COMPARE_RE = re.compile(r"哪[个一]?[个起宗]?(?:案号|案件)?的?(?:涉案金额)?更[高大多]|更[高大多]|对比|比较")
+# 去掉实体和字段后允许剩下的问法用语；还有其他文字说明问题里有模板不理解的诉求
+FILLER_RE = re.compile(
+    r"请问|请|查询|查找|查下|查一下|查|找下|核查|核对|咨询|问下|一下|协助|帮我|帮忙|我想要|我想|想要|了解|知道|您|你|我"
+    r"|能否|可否|能|可以|告知|告诉|提供|同时|此外|另外|还|并|分别|各|是|为|何|什么|多少|哪位|哪个|哪家|哪一方|哪|谁|叫|啥"
+    r"|名字|名称|具体|准确|确切|详细|身份|信息|相关|该|其|这个|这家|这|公司|企业|民事|案件|案子|案号|判决|所|依据|根据"
+    r"|说明|阐述|解释|指出|分析|看看|注册号|注册编号|编号|方|吗|呢|里|中|在|下|针对|关于|通过|手头|有|它们|[一两]起|[一两]宗"
+    r"|两个|均|合同纠纷|案|的|和|与|及|以及|地"
+    r"|[0-9\s，,。？?、；;：:！!“”\"（）()]"
+)
+
+
+def asked_fields(text):
+    """
+    返回问题中提到的 [(表, 字段)]，保持出现顺序、去重
+    """
+    found = []
+    for pattern, table, field in _FIELD_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            found.append((m.start(), table, field))
+            text = pattern.sub(lambda x: "　" * len(x.group()), text)
+    return list(dict.fromkeys((table, field) for _, table, field in sorted(found)))
+
+
+def understood(query, *entities):
+    """
+    去掉实体、字段问法和常见用语后问题是否已经没有剩余内容
+    """
+    text = query
+    for entity in entities:
+        text = text.replace(entity, "")
+    for pattern, _, _ in _FIELD_PATTERNS:
+        text = pattern.sub("", text)
+    return not FILLER_RE.sub("", text)
+
+
+def strip_prefix(text):
+    return PREFIX_RE.sub("", text)
+
+
+def extract_company(query):
+    """
+    问题中唯一的公司：先找全称，找不到时取句首“XX的”中的简称
+    """
+    names = list(dict.fromkeys(strip_prefix(m) for m in COMPANY_RE.findall(query)))
+    if names:
+        return names[0] if len(names) == 1 else None
+    m = SHORT_NAME_RE.match(strip_prefix(query))
+    return m.group(1) if m else None
+
+
+def match_register(query):
+    registers = REGISTER_RE.findall(query)
+    if len(set(registers)) != 1 or CASE_RE.search(query) or asked_fields(query):
+        return None
+    if not re.search(r"公司|企业|名称|名字", query):
+        return None
+    register = registers[0]
+    if not understood(query, register):
+        return None
+    rows = tools.http_api_call("search_company_name_by_register", {"key": "注册号", "value": register})["return"]
+    names = [row["公司名称"] for row in rows if row.get("公司名称")]
+    if not names:
+        return None
+    return {
+        "template": "register_to_name",
+        "facts": {"注册号": register, "公司名称": names},
+        "answer": f"注册号为{register}的公司是{'、'.join(names)}。",
+    }
+
+
+def match_case(query):
+    cases = list(dict.fromkeys(CASE_RE.findall(query)))
+    fields = asked_fields(CASE_RE.sub("", query))
+    if not cases or not fields or any(table != "LegalDocument" for table, _ in fields):
+        return None
+    fields = [field for _, field in fields]
+    compare = COMPARE_RE.search(query)
+    if compare and (fields != ["涉案金额"] or len(cases) < 2):
+        return None
+    if not compare and router.MULTI_RE.search(CASE_RE.sub("", query)):
+        return None
+    if not understood(COMPARE_RE.sub("", query), *cases):
+        return None
+    rows = tools.get_legal_document(cases, fields)["return"]
+    by_case = {row.get("案号"): row for row in rows}
+    if any(case not in by_case for case in cases):
+        return None
+    facts = {case: {field: by_case[case].get(field, "") for field in fields} for case in cases}
+    if compare:
+        amounts = {case: parse_number(facts[case]["涉案金额"]) for case in cases}
+        if any(v is None for v in amounts.values()):
+            return None
+        top = max(cases, key=lambda case: amounts[case])
+        parts = [f"{case}的涉案金额为{facts[case]['涉案金额']}" for case in cases]
+        answer = "，".join(parts) + f"，涉案金额更高的是{top}。"
+    else:
+        answer = "；".join(
+            f"{case}的" + "，".join(f"{field}为{facts[case][field] or '无'}" for field in fields) for case in cases
+        ) + "。"
+    return {"template": "case_fields", "facts": facts, "answer": answer}
+
+
+def match_company(query):
+    if CASE_RE.search(query) or REGISTER_RE.search(query) or "子公司" in query:
+        return None
+    if router.classify(query) != router.SINGLE:
+        return None
+    company = extract_company(query)
+    fields = asked_fields(query.replace(company, "") if company else query)
+    if not company or not fields or any(table not in ("CompanyInfo", "CompanyRegister") for table, _ in fields):
+        return None
+    if not understood(query, company):
+        return None
+    facts, name = {}, None
+    for table, getter in (("CompanyInfo", tools.get_company_info), ("CompanyRegister", tools.get_company_register)):
+        table_fields = [field for t, field in fields if t == table]
+        if not table_fields:
+            continue
+        rows = getter([company], table_fields)["return"]
+        if len(rows) != 1:
+            return None
+        name = rows[0].get("公司名称") or company
+        facts.update({field: rows[0].get(field, "") for field in table_fields})
+    answer = f"{name}的" + "，".join(f"{field}是{facts[field] or '无'}" for _, field in fields) + "。"
+    return {"template": "company_fields", "facts": {"公司名称": name, **facts}, "answer": answer}
+
+
+TEMPLATES = [match_register, match_case, match_company]
+
+
+def match(query):
+    """
+    依次尝试各个模板，返回第一个命中的 {"template", "facts", "answer"}，都不命中时返回 None
+    """
+    for template in TEMPLATES:
+        matched = template(query)
+        if matched:
+            return matched
+    return None
@@ -1,8 +1,21 @@
-import requests
-from tools_register import register_tool, get_tools, dispatch_tool
+import json
+import re
+import threading
+import http_client
+import cache
+import mirror
+import alias_index
+import aggregates
+import columns
+import prefetch
+import result_store
+import concurrency
+import upstream
+import tracing
+from tools_register import register_tool, session_scoped, paginated, get_tools, dispatch_tool, adispatch_tool
 from typing import get_origin, Annotated, Union, List, Optional
 from schema import CompanyInfo, SubCompanyInfo, LegalDocument, CompanyRegister
-from schema import CompanyInfoEnum, SubCompanyInfoEnum, LegalDocumentEnum, CompanyRegisterEnum
+from schema import CompanyInfoEnum, SubCompanyInfoEnum, LegalDocumentEnum, CompanyRegisterEnum, TableEnum, NumericOperationEnum
 
 
 api_list = [
@@ -25,13 +38,66 @@ headers = {
 }
 
 
+# 返回结果会增量加入公司别名索引的接口
+ALIAS_SOURCE_APIS = {
+    "get_company_info": "CompanyInfo",
+    "get_company_register": "CompanyRegister",
+}
+
+# 并发的相同 law_api 请求只发出一次
+_api_flight = concurrency.SingleFlight("law_api")
+
+
 # Tool Definitions
-def http_api_call(api_name, data, max_data_len=None):
+def fetch_api(api_name, data):
     url = f"{domain}/law_api/{api_name}"
-    
-    rsp = requests.post(url, json=data, headers=headers)
-    final_rsp = rsp.json()
-    final_rsp = [final_rsp] if isinstance(final_rsp, dict) else final_rsp
+    policy = upstream.get("law_api")
+
+    # 关闭追踪时不为统计请求大小而序列化请求
+    attrs = {"request_bytes": len(json.dumps(data, ensure_ascii=False).encode("utf-8"))} if tracing.ENABLED else {}
+    with tracing.span("http", api=api_name, **attrs) as s:
+        def request():
+            rsp = http_client.post(url, json=data, headers=headers,
+                                   connect_timeout=policy.connect_timeout, read_timeout=policy.read_timeout)
+            s.set(status=rsp.status_code, response_bytes=len(rsp.content))
+            upstream.raise_for_status(rsp)
+            return rsp.json()
+
+        # 限速、并发上限、超时与退避重试由 upstream 统一处理
+        final_rsp = upstream.call("law_api", request)
+    return [final_rsp] if isinstance(final_rsp, dict) else final_rsp
+
+
+def paren_variants(values):
+    """
+    每个值同时给出全角和半角括号两种写法，law_api 中两种写法的数据都有
+    """
+    values = values if isinstance(values, list) else [values]
+    variants = []
+    for v in values:
+        if isinstance(v, str):
+            variants += [v, v.replace("(", "（").replace(")", "）"), v.replace("（", "(").replace("）", ")")]
+        else:
+            variants.append(v)
+    return list(dict.fromkeys(variants))
+
+
+def http_api_call(api_name, data, max_data_len=None, use_cache=True):
+    if api_name in mirror.GET_APIS:
+        # 缓存键和合并键按实际请求计算，两种括号写法都发出，结果才能在两种写法之间共用
+        param = mirror.GET_APIS[api_name][1]
+        if param in data:
+            data = {**data, param: paren_variants(data[param])}
+    final_rsp = mirror.lookup(api_name, data)
+    if final_rsp is None:
+        # run_all 开始前批量预取过的实体
+        final_rsp = prefetch.lookup(api_name, data)
+    if final_rsp is None:
+        key = cache.make_key(api_name, data)
+        final_rsp = cache.cached_call(
+            api_name, data, lambda: _api_flight.do(key, lambda: fetch_api(api_name, data)), use_cache=use_cache)
+    if api_name in ALIAS_SOURCE_APIS:
+        alias_index.get_index().add_rows(ALIAS_SOURCE_APIS[api_name], final_rsp)
     
     if max_data_len is None:
         max_data_len = len(final_rsp)
@@ -41,87 +107,195 @@ def http_api_call(api_name, data, max_data_len=None):
     }
 
 
+async def ahttp_api_call(api_name, data, max_data_len=None, use_cache=True):
+    return await concurrency.to_thread("law_api", http_api_call, api_name, data, max_data_len, use_cache)
+
+
+# 以这些后缀结尾的名称视为公司全称，不再通过简称/英文名称反查
+FULL_NAME_SUFFIXES = ("有限公司", "有限责任公司", "(有限合伙)", "（有限合伙）", "合伙企业")
+
+
+def is_full_company_name(name):
+    return name.strip().endswith(FULL_NAME_SUFFIXES)
+
+
+def get_company_name_by_info(key, value):
+    return [i["公司名称"] for i in http_api_call("search_company_name_by_info", {"key": key, "value": value})["return"]]
+
+
 def get_company_name_by_bref(bref):
-    company_names = [i["公司名称"] for i in http_api_call("search_company_name_by_info", {"key": "公司简称", "value": bref})["return"]]
-    return company_names
+    return get_company_name_by_info("公司简称", bref)
 
 
 def get_company_name_by_en(bref):
-    company_names = [i["公司名称"] for i in http_api_call("search_company_name_by_info", {"key": "英文名称", "value": bref})["return"]]
-    return company_names
+    return get_company_name_by_info("英文名称", bref)
 
 
 def augment_company_name(company_name):
+    """
+    把简称、英文名称等别名解析为公司全称；已解析的别名不再出现在返回的名称中，
+    这样请求里只有全称，本地镜像和预取才能完整覆盖，未知名称原样保留
+    """
     company_name = company_name if isinstance(company_name, list) else [company_name]
-    for c in company_name[:]:
-        company_name += get_company_name_by_bref(c)
-        company_name += get_company_name_by_en(c)
-        company_name += [c.replace("(", "（").replace(")", "）")]
-        company_name += [c.replace("（", "(").replace("）", ")")]
+    names = set()
+    unresolved = []
+    lookups = []
+    for c in company_name:
+        # 已知别名直接在本地解析，不访问网络
+        resolved = alias_index.resolve(c)
+        if resolved:
+            names.update(resolved)
+            continue
+        unresolved.append(c)
+        if is_full_company_name(c):
+            continue
+        lookups.append(("公司简称", c))
+        # 英文名称一定包含英文字母，纯中文名称不必查询
+        if re.search("[A-Za-z]", c):
+            lookups.append(("英文名称", c))
+
+    # 跨名称去重后并行查询，多个名称的扩展总耗时约为一次请求
+    lookups = list(dict.fromkeys(lookups))
+    index = alias_index.get_index()
+    found_aliases = set()
+    for (key, value), found in zip(lookups, concurrency.thread_map(lambda lookup: get_company_name_by_info(*lookup), lookups)):
+        if found:
+            index.add_alias(value, found)
+            found_aliases.add(value)
+        names.update(found)
+
+    for c in unresolved:
+        if c not in found_aliases:
+            names.update([c, c.replace("(", "（").replace(")", "）"), c.replace("（", "(").replace("）", ")")])
+    return list(names)
+
+
+# 表名 -> (可投影字段枚举, 始终保留的主键字段)
+PROJECTION_FIELDS = {
+    "CompanyInfo": (CompanyInfoEnum, "公司名称"),
+    "CompanyRegister": (CompanyRegisterEnum, "公司名称"),
+    "SubCompanyInfo": (SubCompanyInfoEnum, "公司名称"),
+    "LegalDocument": (LegalDocumentEnum, "案号"),
+}
+
+FIELDS_DESCRIPTION = "需要返回的字段名称列表，为空时返回全部字段"
 
-    return list(set(company_name))
+
+def project_fields(result, table, fields):
+    """
+    只保留 fields 中的字段（以及主键字段），字段名需属于 table 表
+    """
+    if not fields:
+        return result
+    fields = fields if isinstance(fields, list) else [fields]
+    fields = [getattr(f, "value", f) for f in fields]
+    enum_class, key_field = PROJECTION_FIELDS[table]
+    valid = [e.value for e in enum_class]
+    invalid = [f for f in fields if f not in valid and f != key_field]
+    if invalid:
+        raise ValueError(f"字段 {invalid} 不属于 {table} 表，可选字段: {valid}")
+    keep = [key_field] + [f for f in fields if f != key_field]
+    return {
+        "return_items_count": result["return_items_count"],
+        "return": [{f: row[f] for f in keep if f in row} for row in result["return"]]
+    }
 
 
 @register_tool
 def get_company_info(
         company_name: Annotated[list, "公司名称或简称的列表", True],
+        fields: Annotated[list, FIELDS_DESCRIPTION, False] = None,
 ) -> List[CompanyInfo]:
     """
     根据公司名称获得该公司所有基本信息，可以传入多个公司名称，返回一个列表
     """
     company_name = augment_company_name(company_name)
-    return http_api_call("get_company_info", {"company_name": company_name})
+    return project_fields(http_api_call("get_company_info", {"company_name": company_name}), "CompanyInfo", fields)
 
 
 @register_tool
 def get_company_register(
         company_name: Annotated[list, "公司名称或简称的列表", True],
+        fields: Annotated[list, FIELDS_DESCRIPTION, False] = None,
 ) -> List[CompanyRegister]:
     """
     根据公司名称获得该公司所有注册信息，可以传入多个公司名称，返回一个列表
     """
     company_name = augment_company_name(company_name)
-    return http_api_call("get_company_register", {"company_name": company_name})
+    return project_fields(http_api_call("get_company_register", {"company_name": company_name}), "CompanyRegister", fields)
+
+
+# 子公司明细分批查询的批大小
+SUB_COMPANY_CHUNK_SIZE = 50
+
+# 母公司全称 -> 子公司名称列表，跨调用复用
+_sub_company_names = {}
+_sub_company_names_lock = threading.Lock()
+
+
+def get_sub_company_names(parent_name):
+    with _sub_company_names_lock:
+        if parent_name in _sub_company_names:
+            return _sub_company_names[parent_name]
+    names = [i["公司名称"] for i in http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": parent_name})["return"]]
+    with _sub_company_names_lock:
+        _sub_company_names[parent_name] = names
+    return names
+
+
+def merge_api_results(results):
+    items = [item for result in results for item in result["return"]]
+    return {
+        "return_items_count": len(items),
+        "return": items
+    }
 
 
 @register_tool
 def get_sub_company_info(
         company_name: Annotated[list, "母公司名称的列表", True],
+        fields: Annotated[list, FIELDS_DESCRIPTION, False] = None,
 ) -> SubCompanyInfo:
     """
     根据母公司名称获得该母公司所有的关联投资、母公司等信息，可以传入多个母公司名称，返回一个列表
     """
     company_name = augment_company_name(company_name)
     all_subs = company_name[:]
-    for comp_name in company_name:
-        # print("@@@", http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": comp_name})["return"])
-        all_subs += [i["公司名称"] for i in http_api_call("search_company_name_by_sub_info", {"key": "关联上市公司全称", "value": comp_name}, max_data_len=None)["return"]]
-        # print("!", all_subs)
-    print(all_subs)
-    return http_api_call("get_sub_company_info", {"company_name": all_subs})
+    for subs in concurrency.thread_map(get_sub_company_names, company_name):
+        all_subs += subs
+    all_subs = list(dict.fromkeys(all_subs))
+
+    chunks = [all_subs[i:i + SUB_COMPANY_CHUNK_SIZE] for i in range(0, len(all_subs), SUB_COMPANY_CHUNK_SIZE)]
+    result = merge_api_results(concurrency.thread_map(
+        lambda chunk: http_api_call("get_sub_company_info", {"company_name": chunk}), chunks))
+    return project_fields(result, "SubCompanyInfo", fields)
+
 
 @register_tool
 def get_sub_company_info_by_sub_comp(
         company_name: Annotated[list, "子公司名称的列表", True],
+        fields: Annotated[list, FIELDS_DESCRIPTION, False] = None,
 ) -> SubCompanyInfo:
     """
     根据子公司名称获得该子公司所有的关联投资等信息，可以传入多个子公司名称，返回一个列表
     """
     company_name = augment_company_name(company_name)
-    return http_api_call("get_sub_company_info", {"company_name": company_name})
+    return project_fields(http_api_call("get_sub_company_info", {"company_name": company_name}), "SubCompanyInfo", fields)
 
 
 @register_tool
 def get_legal_document(
         case_num: Annotated[list, "案号", True],
+        fields: Annotated[list, FIELDS_DESCRIPTION, False] = None,
 ) -> List[LegalDocument]:
     """
     根据案号查询相关法律文书的内容，可以传入多个案号，返回一个列表
     """
-    return http_api_call("get_legal_document", {"case_num": case_num})
+    return project_fields(http_api_call("get_legal_document", {"case_num": case_num}), "LegalDocument", fields)
 
 
 @register_tool
+@paginated
 def search_company_name_by_info(
         key: Annotated[CompanyInfoEnum, "公司基本信息字段名称", True],
         value: Annotated[str, "公司基本信息字段具体的值", True],
@@ -133,6 +307,7 @@ def search_company_name_by_info(
 
 
 @register_tool
+@paginated
 def search_company_name_by_register(
         key: Annotated[CompanyRegisterEnum, "公司注册信息字段名称", True],
         value: Annotated[str, "公司注册信息字段具体的值", True],
@@ -144,6 +319,7 @@ def search_company_name_by_register(
 
 
 @register_tool
+@paginated
 def search_company_name_by_sub_info(
         key: Annotated[SubCompanyInfoEnum, "子公司融资信息字段名称", True],
         value: Annotated[str, "子公司融资信息信息字段具体的值", True],
@@ -155,6 +331,7 @@ def search_company_name_by_sub_info(
 
 
 @register_tool
+@paginated
 def search_case_num_by_legal_document(
         key: Annotated[LegalDocumentEnum, "法律文书信息字段名称", True],
         value: Annotated[str, "法律文书信息字段具体的值", True],
@@ -165,5 +342,121 @@ def search_case_num_by_legal_document(
     return http_api_call("search_case_num_by_legal_document", {"key": key, "value": value})
 
 
+@register_tool
+@session_scoped
+def fetch_next_page(
+        cursor: Annotated[str, "上一次查询结果中的next_cursor", True],
+) -> dict:
+    """
+    查询结果较多时只返回第一页和next_cursor，使用next_cursor获取下一页结果
+    """
+    return result_store.fetch_page(cursor)
+
+
+# 表名 -> 字段列表 / (get 接口, get 参数名, search 接口)
+TABLE_FIELDS = {table: list(model.__fields__.keys()) for table, model in mirror.TABLES.items()}
+TABLE_APIS = {
+    table: (get_api, param, next(api for api, (t, _) in mirror.SEARCH_APIS.items() if t == table))
+    for get_api, (table, param, _) in mirror.GET_APIS.items()
+}
+# 批量 get 请求的批大小
+GET_CHUNK_SIZE = 50
+
+
+def search_table(table, key, value):
+    """
+    返回 table 表中 key 字段等于 value 的记录主键（公司名称或案号）列表
+    """
+    return_field = mirror.SEARCH_APIS[TABLE_APIS[table][2]][1]
+    rows = http_api_call(TABLE_APIS[table][2], {"key": key, "value": value})["return"]
+    return list(dict.fromkeys(i[return_field] for i in rows if return_field in i))
+
+
+def fetch_table(table, keys):
+    get_api, param, _ = TABLE_APIS[table]
+    chunks = [keys[i:i + GET_CHUNK_SIZE] for i in range(0, len(keys), GET_CHUNK_SIZE)]
+    return merge_api_results(concurrency.thread_map(lambda chunk: http_api_call(get_api, {param: chunk}), chunks))["return"]
+
+
+def check_field(table, field):
+    if field not in TABLE_FIELDS[table]:
+        raise ValueError(f"`{field}` 不是 {table} 表的字段，可选字段: {TABLE_FIELDS[table]}")
+
+
+@register_tool
+def count_by_field(
+        table: Annotated[TableEnum, "数据表名称", True],
+        key: Annotated[str, "字段名称", True],
+        value: Annotated[str, "字段具体的值，为空时返回该字段每个取值对应的记录数", False] = "",
+) -> dict:
+    """
+    统计某张表中某个字段等于某个值的公司（或案件）数量，例如某个所属行业有多少家公司、某个案由有多少个案件
+    """
+    table = getattr(table, "value", table)
+    check_field(table, key)
+    if value:
+        return {"count": len(search_table(table, key, value))}
+    # 部分同步的镜像只能给出部分记录的计数，不能当作全表统计
+    if not mirror.get_mirror().is_complete(table):
+        return {"error": "本地镜像中没有该表的完整数据，请提供字段具体的值"}
+    return {"counts": dict(aggregates.group_counts(table, key))}
+
+
+@register_tool
+def numeric_query(
+        table: Annotated[TableEnum, "数据表名称", True],
+        operation: Annotated[NumericOperationEnum, "count为统计满足条件的记录数，sum为对field求和，top_k为按field排序取前k条", True],
+        conditions: Annotated[list, "数值条件列表，每个条件形如 上市公司参股比例>50 或 上市公司投资金额>=5000万，全部满足；不写单位时按字段原始单位", False] = None,
+        company_name: Annotated[list, "限定的公司名称列表，SubCompanyInfo表为母公司名称", False] = None,
+        filter_key: Annotated[str, "筛选字段名称，可以是其他表的字段，例如所属行业", False] = "",
+        filter_value: Annotated[str, "筛选字段具体的值", False] = "",
+        field: Annotated[str, "sum和top_k使用的数值字段名称，例如注册资本、上市公司投资金额、涉案金额", False] = "",
+        k: Annotated[int, "top_k返回的记录数", False] = 5,
+        ascending: Annotated[bool, "top_k是否按从小到大排序，默认从大到小", False] = False,
+) -> dict:
+    """
+    在数值字段上筛选、计数、求和或取前k条，例如控股超50%且投资超5000万的子公司数量、子公司投资总金额、某行业注册资本最高的前3家公司
+    金额的结果单位为元，比例为百分数数值
+    """
+    table = getattr(table, "value", table)
+    operation = getattr(operation, "value", operation)
+    parsed = [columns.parse_condition(c) for c in (conditions or [])]
+    for f in [f for f, _, _ in parsed] + ([field] if field else []):
+        check_field(table, f)
+    if operation in ("sum", "top_k") and not field:
+        raise ValueError(f"{operation} 需要指定 field")
+    key_field = mirror.GET_APIS[TABLE_APIS[table][0]][2]
+
+    text_in = None
+    if company_name and table == "SubCompanyInfo":
+        parents = augment_company_name(company_name)
+        cols = columns.Columns(get_sub_company_info(company_name)["return"], key_field)
+        text_in = {"关联上市公司全称": parents}
+    elif company_name:
+        if table == "LegalDocument":
+            raise ValueError("LegalDocument 表不能按公司名称限定")
+        cols = columns.Columns(fetch_table(table, augment_company_name(company_name)), key_field)
+    elif filter_key:
+        # 筛选字段不在当前表时，按公司名称关联到包含该字段的表
+        filter_table = table if filter_key in TABLE_FIELDS[table] else next(
+            (t for t in ["CompanyInfo", "CompanyRegister", "SubCompanyInfo"] if filter_key in TABLE_FIELDS[t]), None)
+        if filter_table is None:
+            raise ValueError(f"未知的筛选字段 `{filter_key}`")
+        cols = columns.Columns(fetch_table(table, search_table(filter_table, filter_key, filter_value)), key_field)
+    elif mirror.get_mirror().is_complete(table):
+        cols = columns.from_mirror(table, key_field)
+    else:
+        return {"error": "本地镜像中没有该表的完整数据，请提供公司名称或筛选条件"}
+
+    mask = cols.unique(cols.mask(parsed, text_in))
+    if operation == "count":
+        return {"count": cols.count(mask), key_field: [row.get(key_field, "") for row in cols.select(mask)][:100]}
+    if operation == "sum":
+        return {"count": cols.count(mask), "sum": cols.sum(field, mask),
+                key_field: [row.get(key_field, "") for row in cols.select(mask)][:100]}
+    return {"top_k": [{key_field: row.get(key_field, ""), field: row.get(field, ""), "数值": value}
+                      for value, row in cols.top_k(field, k, mask, ascending=ascending)]}
+
+
 if __name__ == "__main__":
     print(get_sub_company_info(**{"company_name": "北京长久物流股份有限公司"}))
\ No newline at end of file
@@ -5,7 +5,6 @@ through defined interfaces.
 """
 
 from collections.abc import Callable
-import copy
 import inspect
 import json
 from pprint import pformat
@@ -17,6 +16,11 @@ import requests
 from enum import Enum
 
 from interface import ToolObservation
+import cache
+import concurrency
+import result_store
+import tracing
+import upstream
 
 
 ALL_TOOLS = {
@@ -26,6 +30,153 @@ ALL_TOOLS = {
 _TOOL_HOOKS = {}
 _TOOL_DESCRIPTIONS = []
 
+_TOOL_VALIDATORS = {}
+# 结果依赖会话（例如分页 cursor）的工具，合并相同调用时只在同一会话内合并
+_SESSION_SCOPED_TOOLS = set()
+# 返回完整结果、由 dispatch_tool 分页后再交给模型的工具
+_PAGINATED_TOOLS = set()
+# get_tools() 返回的只读描述，注册新工具时失效
+_frozen_tools = None
+
+_dispatch_flight = concurrency.SingleFlight("dispatch_tool")
+
+
+class FrozenDict(dict):
+    """
+    只读的 dict，可以直接 json 序列化；拷贝时返回自身
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("tool descriptors are read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return FrozenDict({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _to_list(value):
+    # 模型有时会把列表包成 {"items": [...]}，或者只传一个字符串
+    if isinstance(value, dict):
+        for key in ("Items", "items"):
+            if key in value:
+                return _to_list(value[key])
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, str):
+        return [value]
+    raise TypeError(f"需要列表，实际为 {type(value).__name__}")
+
+
+def _to_str(value):
+    if isinstance(value, (dict, list)):
+        raise TypeError(f"需要字符串，实际为 {type(value).__name__}")
+    return str(value)
+
+
+def _to_int(value):
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise TypeError(f"需要整数，实际为 {value!r}")
+    return int(value)
+
+
+def _to_float(value):
+    if isinstance(value, bool):
+        raise TypeError(f"需要数字，实际为 {value!r}")
+    return float(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if str(value).lower() in ("true", "1", "yes", "是"):
+        return True
+    if str(value).lower() in ("false", "0", "no", "否", ""):
+        return False
+    raise TypeError(f"需要布尔值，实际为 {value!r}")
+
+
+def _enum_coercer(enum_class):
+    values = [e.value for e in enum_class]
+
+    def coerce(value):
+        value = getattr(value, "value", value)
+        if value not in values:
+            raise ValueError(f"取值 {value!r} 无效，可选值: {values}")
+        return value
+    return coerce
+
+
+def _coercer(typo):
+    if isinstance(typo, type) and issubclass(typo, Enum):
+        return _enum_coercer(typo)
+    if typo is list or get_origin(typo) is list:
+        return _to_list
+    return {str: _to_str, int: _to_int, float: _to_float, bool: _to_bool}.get(typo, lambda value: value)
+
+
+def compile_validator(params):
+    """
+    params: [(参数名, 类型, 是否必填)]，注册时编译一次
+    返回 validate(args) -> (转换后的参数, 错误列表)
+    """
+    compiled = [(name, required, _coercer(typo)) for name, typo, required in params]
+    names = {name for name, _, _ in params}
+
+    def validate(args):
+        if not isinstance(args, dict):
+            return None, [{"param": None, "error": "参数必须是JSON对象"}]
+        errors = [{"param": k, "error": "未知参数"} for k in args if k not in names]
+        kwargs = {}
+        for name, required, coerce in compiled:
+            if args.get(name) is None:
+                if required:
+                    errors.append({"param": name, "error": "缺少必填参数"})
+                continue
+            try:
+                kwargs[name] = coerce(args[name])
+            except (TypeError, ValueError) as e:
+                errors.append({"param": name, "error": str(e)})
+        return kwargs, errors
+    return validate
+
+
+def tool_error(kind, tool_name, **detail):
+    """
+    返回给模型的结构化错误
+    """
+    return json.dumps({"error": kind, "tool": tool_name, **detail}, ensure_ascii=False)
+
+
+def session_scoped(func: Callable):
+    """
+    标记工具的结果和当前会话绑定，放在 @register_tool 下面使用
+    """
+    _SESSION_SCOPED_TOOLS.add(func.__name__)
+    return func
+
+
+def paginated(func: Callable):
+    """
+    标记工具返回 {"return_items_count", "return"} 的完整结果，只有经 dispatch_tool 交给模型时才按会话分页；
+    直接调用（sandbox、模板）得到的仍是全部记录。放在 @register_tool 下面使用
+    """
+    _PAGINATED_TOOLS.add(func.__name__)
+    return func
+
 
 def register_tool_new(func: Callable):
     tool_name = func.__name__
@@ -67,11 +218,13 @@ def register_tool_new(func: Callable):
 
 
 def register_tool(func: Callable):
+    global _frozen_tools
     tool_name = func.__name__
     tool_description = inspect.getdoc(func).strip()
     python_params = inspect.signature(func).parameters
     tool_params = {}
     required_params = []
+    validator_params = []
     for name, param in python_params.items():
         annotation = param.annotation
         if annotation is inspect.Parameter.empty:
@@ -93,6 +246,7 @@ def register_tool(func: Callable):
 
         if required:
             required_params.append(name)
+        validator_params.append((name, typo, required))
 
         try:
             if issubclass(typo, Enum):
@@ -114,12 +268,25 @@ def register_tool(func: Callable):
     # print("[registered tool] " + pformat(tool_def))
     _TOOL_HOOKS[tool_name] = func
     _TOOL_DESCRIPTIONS.append(tool_def)
+    _TOOL_VALIDATORS[tool_name] = compile_validator(validator_params)
+    _frozen_tools = None
+    # 异步版本: await get_company_info.aio(company_name=[...])
+    func.aio = concurrency.asyncify(func)
 
     return func
 
 
 def dispatch_tool(tool_name: str, code: str, session_id: str) -> list[ToolObservation]:
-    print("TOOL CALL! ", tool_name, code, session_id)
+    if not tracing.ENABLED:
+        return _dispatch_tool(tool_name, code, session_id)
+    with tracing.span("tool", tool=tool_name, args_bytes=len(code.encode("utf-8"))) as s:
+        ret = _dispatch_tool(tool_name, code, session_id)
+        s.set(result_bytes=len(str(ret).encode("utf-8")))
+        return ret
+
+
+def _dispatch_tool(tool_name: str, code: str, session_id: str) -> list[ToolObservation]:
+    tracing.vprint("TOOL CALL! ", tool_name, code, session_id)
     # Dispatch predefined tools
     if tool_name in ALL_TOOLS:
         return ALL_TOOLS[tool_name](code, session_id)
@@ -127,40 +294,67 @@ def dispatch_tool(tool_name: str, code: str, session_id: str) -> list[ToolObserv
     code = code.strip().rstrip('<|observation|>').strip()
 
     # Dispatch custom tools
+    if tool_name not in _TOOL_HOOKS:
+        err = tool_error("unknown_tool", tool_name, message="Please use a provided tool.")
+        print("system_error", err)
+        return err
+
     try:
-        tool_params = json.loads(code)
+        tool_params = json.loads(code) if code else {}
     except json.JSONDecodeError as e:
-        err = f"Error decoding JSON: {e}"
+        err = tool_error("invalid_json", tool_name, message=str(e))
         print("system_error", err)
         return err
 
-    if tool_name not in _TOOL_HOOKS:
-        err = f"Tool `{tool_name}` not found. Please use a provided tool."
+    # 参数校验失败是确定性的错误，不调用工具，直接把错误返回给模型
+    tool_params, errors = _TOOL_VALIDATORS[tool_name](tool_params)
+    if errors:
+        err = tool_error("invalid_arguments", tool_name, details=errors)
         print("system_error", err)
         return err
-
     tool_hook = _TOOL_HOOKS[tool_name]
+    tracing.vprint("FFFFF", tool_name, tool_params)
 
-    for k, v in tool_params.items():
-        if "Items" in v:
-            tool_params[k] = v["Items"]
-        if "items" in v:
-            tool_params[k] = v["items"]
-    print("FFFFF", tool_name, tool_params)
-    for i in range(3):
+    def call():
+        # 网络层的瞬时错误已在 upstream 中退避重试，这里只执行一次
         try:
-            ret: str = tool_hook(**tool_params)
             # return [ToolObservation(tool_name, str(ret))]
-            return json.dumps(ret, ensure_ascii=False)
-        except Exception:
-            err = traceback.format_exc()
-            print("system_error", err)
+            return True, tool_hook(**tool_params)
+        except Exception as e:
+            print("system_error", traceback.format_exc())
+            transient, status, _ = upstream.classify_error(e)
+            return False, tool_error("transient" if transient else "tool_error", tool_name,
+                                     type=type(e).__name__, status=status, message=str(e)[:500])
+
+    # 多个问题同时发起的相同工具调用只执行一次；会话相关的工具只合并同一会话内的调用
+    key = cache.make_key(tool_name, tool_params)
+    if tool_name in _SESSION_SCOPED_TOOLS:
+        key += ":" + session_id
+    token = result_store.current_session.set(session_id)
+    try:
+        ok, ret = _dispatch_flight.do(key, call)
+        if not ok:
+            return ret
+        # 合并后的完整结果由每个调用方各自分页，分页结果保存在各自的会话中
+        if tool_name in _PAGINATED_TOOLS and isinstance(ret, dict) and isinstance(ret.get("return"), list):
+            ret = result_store.paginate(ret["return"])
+        return json.dumps(ret, ensure_ascii=False)
+    finally:
+        result_store.current_session.reset(token)
+
 
-    return err
+async def adispatch_tool(tool_name: str, code: str, session_id: str) -> list[ToolObservation]:
+    return await concurrency.to_thread("law_api", dispatch_tool, tool_name, code, session_id)
 
 
 def get_tools() -> list[dict]:
-    return copy.deepcopy(_TOOL_DESCRIPTIONS)
+    """
+    所有工具的描述：每个描述只读且在注册后只构建一次，外层每次返回新的列表，调用方可以追加或拼接
+    """
+    global _frozen_tools
+    if _frozen_tools is None:
+        _frozen_tools = _freeze(_TOOL_DESCRIPTIONS)
+    return list(_frozen_tools)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
-import requests
+import http_client
+import concurrency
 from tools_register import register_tool, get_tools, dispatch_tool
 from typing import get_origin, Annotated, Union, List, Optional
 from schema import CompanyInfo, SubCompanyInfo, LegalDocument, CompanyRegister
@@ -29,8 +30,9 @@ headers = {
 def http_api_call(api_name, data):
     url = f"{domain}/law_api/{api_name}"
     
-    rsp = requests.post(url, json=data, headers=headers)
-    final_rsp = rsp.json()
+    with concurrency.limit("law_api"):
+        rsp = http_client.post(url, json=data, headers=headers)
+        final_rsp = rsp.json()
     final_rsp = [final_rsp] if isinstance(final_rsp, dict) else final_rsp
     return {
         "return_items_count": len(final_rsp),
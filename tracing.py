@@ -0,0 +1,127 @@
+"""
+轻量的 span 追踪：问题 -> LLM 轮次 -> 工具调用 -> HTTP 请求。
+
+每个 span 记录耗时和任意属性（payload 字节数、token 用量、重试次数等），父子关系通过 contextvars 传递，
+在 asyncio 任务和 concurrency 的线程池之间同样有效。span 只在结束时追加到一个有界队列，开销很小，可以常开。
+
+    with tracing.span("http", api=api_name) as s:
+        s.set(response_bytes=len(body))
+    tracing.export_jsonl("trace.jsonl")
+    tracing.export_chrome("trace.json")     # chrome://tracing 或 Perfetto 打开
+
+LAW_VERBOSE=1 时 vprint 才会输出完整的消息内容。
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+ENABLED = os.environ.get("LAW_TRACE", "1") != "0"
+VERBOSE = os.environ.get("LAW_VERBOSE", "") == "1"
+MAX_SPANS = 200000
+
+_current = contextvars.ContextVar("current_span", default=None)
+_spans = deque(maxlen=MAX_SPANS)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "start", "end", "thread", "attrs")
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start = time.time()
+        self.end = None
+        self.thread = threading.get_ident()
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, value=1):
+        self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self):
+        return {
+            "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "start": self.start, "duration": (self.end or time.time()) - self.start, "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, value=1):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name, **attrs):
+    if not ENABLED:
+        yield _NOOP
+        return
+    s = Span(name, _current.get(), attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = repr(e)[:200]
+        raise
+    finally:
+        s.end = time.time()
+        _current.reset(token)
+        _spans.append(s)
+
+
+def current():
+    return _current.get() or _NOOP
+
+
+def spans():
+    return [s.to_dict() for s in list(_spans)]
+
+
+def clear():
+    _spans.clear()
+
+
+def export_jsonl(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for s in spans():
+            f.write(json.dumps(s, ensure_ascii=False, default=str) + "\n")
+
+
+def export_chrome(path):
+    """
+    Chrome trace event 格式，每个问题（trace）显示为一行
+    """
+    events = []
+    for s in spans():
+        events.append({
+            "name": s["name"], "ph": "X", "pid": 1, "tid": s["trace_id"],
+            "ts": int(s["start"] * 1e6), "dur": int(s["duration"] * 1e6), "args": s["attrs"],
+        })
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+
+def vprint(*args):
+    if VERBOSE:
+        print(*args)
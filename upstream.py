@@ -0,0 +1,193 @@
+"""
+law_api 与 GLM 的统一调用策略：令牌桶限速、连接/读取超时、带抖动的指数退避重试（遵守 429 的 Retry-After）、
+以及按错误率自适应调整的并发上限（AIMD：成功时加性增长，限流/超时/5xx 时减半）。
+
+    upstream.call("law_api", func)   # 按 law_api 的策略执行 func，func 抛出的可重试错误会退避后重试
+    upstream.metrics()               # 每个上游的请求数、重试数、限流次数、当前并发上限等
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code, message="", retry_after=None):
+        super().__init__(f"HTTP {status_code} {message}".strip())
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers):
+    try:
+        return float((headers or {}).get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_status(rsp):
+    if rsp.status_code >= 400:
+        raise UpstreamError(rsp.status_code, rsp.text[:200], parse_retry_after(rsp.headers))
+
+
+def classify_error(e):
+    """
+    返回 (是否可重试, HTTP 状态码, Retry-After 秒数)
+    """
+    response = getattr(e, "response", None)
+    status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    retry_after = getattr(e, "retry_after", None)
+    if retry_after is None and response is not None:
+        retry_after = parse_retry_after(getattr(response, "headers", None))
+    if status is not None:
+        return status == 429 or status >= 500, status, retry_after
+    # requests / httpx / zhipuai 的超时和连接错误
+    name = type(e).__name__
+    return "Timeout" in name or "Connection" in name, None, retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    def __init__(self, initial, min_limit=1, max_limit=None):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit or initial
+        self.in_flight = 0
+        # 上一次减半的时间，在此之前发出的请求失败不再减半
+        self._last_cut = float("-inf")
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """
+        占用一个并发名额，返回请求的发出时间，失败时传给 on_overload
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        try:
+            yield time.monotonic()
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            # 每个窗口（约 limit 个成功请求）增加 1
+            self.limit = min(self.max_limit, self.limit + 1 / max(self.limit, 1))
+            self._cond.notify_all()
+
+    def on_overload(self, sent_at=None):
+        with self._cond:
+            # 同一批并发请求的失败只减半一次：上次减半之前发出的请求反映的是减半前的负载
+            if sent_at is not None and sent_at < self._last_cut:
+                return
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_cut = time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name, rate, burst, max_concurrency, connect_timeout, read_timeout,
+                 max_retries=3, base_delay=0.5, max_delay=30):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(max_concurrency, max_limit=max_concurrency)
+        self._lock = threading.Lock()
+        self._metrics = {"requests": 0, "successes": 0, "failures": 0, "retries": 0,
+                         "throttled": 0, "timeouts": 0, "latency_total": 0.0}
+
+    def _count(self, **kwargs):
+        with self._lock:
+            for k, v in kwargs.items():
+                self._metrics[k] += v
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            start = time.time()
+            sent_at = None
+            try:
+                with self.limiter.slot() as sent_at:
+                    result = func()
+            except Exception as e:
+                retryable, status, retry_after = classify_error(e)
+                self._count(requests=1, latency_total=time.time() - start,
+                            throttled=int(status == 429), timeouts=int("Timeout" in type(e).__name__))
+                if retryable:
+                    self.limiter.on_overload(sent_at)
+                if not retryable or attempt >= self.max_retries:
+                    self._count(failures=1)
+                    raise
+                self._count(retries=1)
+                tracing.current().add("retries")
+                time.sleep(self.backoff(attempt, retry_after))
+                attempt += 1
+                continue
+            self._count(requests=1, successes=1, latency_total=time.time() - start)
+            self.limiter.on_success()
+            return result
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["avg_latency"] = metrics.pop("latency_total") / metrics["requests"] if metrics["requests"] else 0.0
+        metrics["concurrency_limit"] = round(self.limiter.limit, 2)
+        metrics["in_flight"] = self.limiter.in_flight
+        return metrics
+
+
+UPSTREAMS = {
+    "law_api": Upstream("law_api", rate=50, burst=50, max_concurrency=32, connect_timeout=5, read_timeout=60),
+    "glm": Upstream("glm", rate=10, burst=20, max_concurrency=16, connect_timeout=10, read_timeout=120),
+}
+
+
+def get(name):
+    return UPSTREAMS[name]
+
+
+def call(name, func):
+    return UPSTREAMS[name].call(func)
+
+
+def metrics():
+    return {name: u.get_metrics() for name, u in UPSTREAMS.items()}
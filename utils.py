@@ -1,20 +1,116 @@
-import concurrent.futures
+import queue
+from collections import deque
+import threading
+import time
+from concurrent.futures import CancelledError
 from tqdm import tqdm
 
 
-def multi_thread_excute(all_tasks, parralle_num=20):
+class TaskScheduler:
+    '''
+    持续调度任务：始终保持parralle_num个任务在运行，任意一个完成后立即启动下一个，而不是等一整批都结束。
+    每个任务是[func, *args]，结果以(index, result, error)的形式按完成顺序（或keep_order时按输入顺序）流式返回。
+    timeout为单个任务的超时时间（秒），超时的任务立即返回TimeoutError，但线程无法强制终止，仍会占用law_api/GLM资源，
+    所以它继续占用一个名额直到线程自行结束，运行中的线程始终不超过parralle_num个；它迟到的结果被丢弃。
+    '''
+
+    def __init__(self, parralle_num=20, timeout=None):
+        self.parralle_num = parralle_num
+        self.timeout = timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        '''
+        停止启动新任务，尚未启动和仍在运行的任务都以CancelledError返回
+        '''
+        self._cancelled.set()
+
+    def stream(self, all_tasks, keep_order=False):
+        results = queue.Queue()
+        pending = deque(enumerate(all_tasks))
+        running = {}  # index -> deadline
+        orphaned = set()  # 已超时但线程仍在运行的任务
+        buffered = {}
+        next_index = 0
+
+        def worker(index, task):
+            try:
+                results.put((index, task[0](*task[1:]), None))
+            except BaseException as e:
+                results.put((index, None, e))
+
+        def start_next():
+            if not pending or len(running) + len(orphaned) >= self.parralle_num:
+                return False
+            index, task = pending.popleft()
+            running[index] = None if self.timeout is None else time.time() + self.timeout
+            threading.Thread(target=worker, args=(index, task), daemon=True).start()
+            return True
+
+        def emit(item):
+            nonlocal next_index
+            if not keep_order:
+                yield item
+                return
+            buffered[item[0]] = item
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+
+        for _ in range(self.parralle_num):
+            if not start_next():
+                break
+
+        # 还有任务没启动时需要等超时任务的线程结束后让出名额
+        while (running or pending) and not self._cancelled.is_set():
+            deadlines = [d for d in running.values() if d is not None]
+            wait = max(min(deadlines) - time.time(), 0) if deadlines else None
+            try:
+                # 定期醒来检查是否被取消
+                index, result, error = results.get(timeout=min(wait, 1) if wait is not None else 1)
+            except queue.Empty:
+                expired = [i for i, d in running.items() if d is not None and d <= time.time()]
+                if not expired:
+                    continue
+                index, result, error = expired[0], None, TimeoutError(f"task {expired[0]} timed out after {self.timeout}s")
+                del running[index]
+                orphaned.add(index)
+                yield from emit((index, result, error))
+                continue
+            if index in orphaned:
+                # 已超时任务的迟到结果：丢弃，线程结束后名额才让出
+                orphaned.discard(index)
+                if not self._cancelled.is_set():
+                    start_next()
+                continue
+            if index not in running:
+                continue
+            del running[index]
+            if not self._cancelled.is_set():
+                start_next()
+            yield from emit((index, result, error))
+
+        if self._cancelled.is_set():
+            for index in sorted(list(running) + [index for index, _ in pending]):
+                yield from emit((index, None, CancelledError()))
+
+
+def multi_thread_excute(all_tasks, parralle_num=20, keep_order=False, timeout=None, on_result=None):
     '''
     多线程运行任务，注意，返回结果序并不和all_tasks一致，请设计好task的输出，能够通过map的形式找到对应的答案
+    keep_order=True时按all_tasks的顺序返回；超时或被取消的任务不出现在结果中，其他异常照常抛出
+    on_result在调用方线程中对每个按时完成的结果调用一次，超时任务迟到的结果不会触发
     '''
-    def multi_thread_excute_helper(tasks):
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            exe_tasks = [executor.submit(*task) for task in tasks]
-            results = [future.result()
-                       for future in concurrent.futures.as_completed(exe_tasks)]
-        return results
-    
     all_results = []
-    for i in tqdm(range(0, len(all_tasks), parralle_num)):
-        all_results += multi_thread_excute_helper(
-            all_tasks[i:i + parralle_num])
-    return all_results
\ No newline at end of file
+    scheduler = TaskScheduler(parralle_num, timeout)
+    for index, result, error in tqdm(scheduler.stream(all_tasks, keep_order=keep_order), total=len(all_tasks)):
+        if isinstance(error, (TimeoutError, CancelledError)):
+            print("task skipped", index, repr(error))
+            continue
+        if error is not None:
+            scheduler.cancel()
+            raise error
+        if on_result is not None:
+            on_result(result)
+        all_results.append(result)
+    return all_results